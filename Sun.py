@@ -30,8 +30,14 @@ __all__ = ['SUN_PY_VERSION', 'Sun']
 
 SUN_PY_VERSION = 1.5
 
+import os
+import sys
 import math
+import heapq
+import array
+import struct
 import calendar
+import datetime
 
 
 class Sun:
@@ -78,6 +84,65 @@ class Sun:
         """
         return cls.__daylen(year, month, day, lon, lat, -18.0, 0)
 
+    # The altitude and upper_limb used by each of the macros above, for
+    # dayLengthGrid.
+    DAY_LENGTHS = {"dayLength": (-35.0 / 60.0, 1),
+                   "dayCivilTwilightLength": (-6.0, 0),
+                   "dayNauticalTwilightLength": (-12.0, 0),
+                   "dayAstronomicalTwilightLength": (-18.0, 0)}
+
+    @classmethod
+    def dayLengthGrid(cls, dates, lons, lats, kind="dayLength"):
+        """
+        This macro computes the length of the day, as the macro named kind
+        (one of DAY_LENGTHS) would, on a grid of dates, latitudes and
+        longitudes. dates is a sequence of datetime.date (or anything with
+        year, month and day attributes). Returns a list of lists of lists
+        indexed by date, then latitude, then longitude.
+
+        As __daylen says, the longitude is not critical, so the length is
+        computed once for each date and latitude (at longitude 0.0) and
+        repeated across the longitudes.
+        """
+        altit, upper_limb = cls.DAY_LENGTHS[kind]
+        sin, cos, acos, sqrt = math.sin, math.cos, math.acos, math.sqrt
+        radians, degrees = math.radians, math.degrees
+        sin_lats = [sin(radians(lat)) for lat in lats]
+        cos_lats = [cos(radians(lat)) for lat in lats]
+        columns = len(lons)
+
+        numbers = cls.dayNumbers([date.year for date in dates],
+                                 [date.month for date in dates],
+                                 [date.day for date in dates])
+
+        grid = []
+        for n in numbers:
+            # As __daylen, at 12h mean solar time at Greenwich
+            d = n + 0.5
+            obl_ecl = 23.4393 - 3.563E-7 * d
+            slon, sr = cls.__sunpos(d)
+            sin_sdecl = sin(radians(obl_ecl)) * sin(radians(slon))
+            cos_sdecl = sqrt(1.0 - sin_sdecl * sin_sdecl)
+            if upper_limb:
+                sin_altit = sin(radians(altit - 0.2666 / sr))
+            else:
+                sin_altit = sin(radians(altit))
+
+            rows = []
+            for sin_lat, cos_lat in zip(sin_lats, cos_lats):
+                cost = (sin_altit - sin_lat * sin_sdecl) / \
+                       (cos_lat * cos_sdecl)
+                if cost >= 1.0:
+                    length = 0.0             # Sun always below altit
+                elif cost <= -1.0:
+                    length = 24.0      # Sun always above altit
+                else:
+                    length = 2.0 / 15.0 * degrees(acos(cost))
+                rows.append([length] * columns)
+            grid.append(rows)
+
+        return grid
+
     @classmethod
     def sunRiseSet(cls, year, month, day, lon, lat):
         """
@@ -125,11 +190,577 @@ class Sun:
         """
         return cls.__sunriset(year, month, day, lon, lat, -18.0, 0)
 
+    # The status of each day returned by the *Range and *Locations macros
+    # below, as returned by the original C __sunriset: the Sun crosses the
+    # altitude, stays above it all day, or stays below it all day.
+    RISES = 0
+    ALWAYS_UP = 1
+    ALWAYS_DOWN = -1
+
+    # Every kind of time the macros above compute, as (macro name, altit,
+    # upper_limb, hours to move the rise and set times outwards by).
+    EVENT_TYPES = (("sunRiseSet", -35.0 / 60.0, 1, 0.0),
+                   ("aviationTime", -35.0 / 60.0, 1, 0.5),
+                   ("civilTwilight", -6.0, 0, 0.0),
+                   ("nauticalTwilight", -12.0, 0, 0.0),
+                   ("astronomicalTwilight", -18.0, 0, 0.0))
+
+    # What events() calls the start and end times of each kind above.
+    EVENT_NAMES = {"sunRiseSet": ("sunrise", "sunset"),
+                   "aviationTime": ("first launch", "last landing"),
+                   "civilTwilight": ("civil dawn", "civil dusk"),
+                   "nauticalTwilight": ("nautical dawn", "nautical dusk"),
+                   "astronomicalTwilight": ("astronomical dawn",
+                                            "astronomical dusk")}
+
+    @classmethod
+    def allTimes(cls, year, month, day, lon, lat):
+        """
+        This macro computes every kind of time listed in EVENT_TYPES at
+        once. Returns a dict mapping the name of each macro to the (rise,
+        set) pair it would return. The Sun's position is only computed
+        once.
+        """
+        times = cls.__sunrisetMulti(year, month, day, lon, lat,
+                [(altit, upper_limb)
+                 for name, altit, upper_limb, offset in cls.EVENT_TYPES])
+        result = {}
+        for (name, altit, upper_limb, offset), (r, s) in \
+                zip(cls.EVENT_TYPES, times):
+            result[name] = (r - offset, s + offset)
+        return result
+
+    # The same macros for a run of consecutive days. These return three
+    # lists (rise times, set times and the status of each day) and are much
+    # cheaper than calling the single-day macros in a loop. By default they
+    # assume, like the macros above, that the Sun stays where it is at
+    # local noon all day. Pass iterations=n to refine each time up to n
+    # times using the Sun's position at that time instead (2 or 3 is
+    # plenty).
+
+    @classmethod
+    def sunRiseSetRange(cls, year, month, day, days, lon, lat,
+                        iterations=0, elevation=0.0, refraction=35.0):
+        """
+        This macro computes times for sunrise/sunset for the given number
+        of days, starting at year, month, day. elevation and refraction
+        are as for horizonAltitudes.
+        """
+        return cls.__sunrisetRange(year, month, day, days, lon, lat,
+                cls.horizonAltitudes([elevation], [refraction])[0], 1,
+                iterations)
+
+    @classmethod
+    def aviationTimeRange(cls, year, month, day, days, lon, lat,
+                          iterations=0, elevation=0.0, refraction=35.0):
+        """
+        This macro computes the first launch and last landing times for the
+        given number of days, starting at year, month, day. elevation and
+        refraction are as for horizonAltitudes.
+        """
+        rises, sets, statuses = cls.__sunrisetRange(year, month, day, days,
+                lon, lat, cls.horizonAltitudes([elevation], [refraction])[0],
+                1, iterations)
+        return [r - 0.5 for r in rises], [s + 0.5 for s in sets], statuses
+
+    @classmethod
+    def civilTwilightRange(cls, year, month, day, days, lon, lat,
+                           iterations=0):
+        """
+        This macro computes the start and end times of civil twilight for
+        the given number of days, starting at year, month, day.
+        """
+        return cls.__sunrisetRange(year, month, day, days, lon, lat, -6.0, 0,
+                                   iterations)
+
+    @classmethod
+    def nauticalTwilightRange(cls, year, month, day, days, lon, lat,
+                              iterations=0):
+        """
+        This macro computes the start and end times of nautical twilight for
+        the given number of days, starting at year, month, day.
+        """
+        return cls.__sunrisetRange(year, month, day, days, lon, lat, -12.0, 0,
+                                   iterations)
+
+    @classmethod
+    def astronomicalTwilightRange(cls, year, month, day, days, lon, lat,
+                                  iterations=0):
+        """
+        This macro computes the start and end times of astronomical twilight
+        for the given number of days, starting at year, month, day.
+        """
+        return cls.__sunrisetRange(year, month, day, days, lon, lat, -18.0, 0,
+                                   iterations)
+
+    @classmethod
+    def allTimesRange(cls, year, month, day, days, lon, lat, iterations=0):
+        """
+        This macro computes every kind of time listed in EVENT_TYPES for
+        the given number of days, starting at year, month, day. Returns a
+        dict mapping the name of each macro to the (rises, sets, statuses)
+        its *Range version would return.
+        """
+        times = cls.__crossings(year, month, day, days, [lon], [lat],
+                [(altit, upper_limb)
+                 for name, altit, upper_limb, offset in cls.EVENT_TYPES],
+                iterations)
+        result = {}
+        for (name, altit, upper_limb, offset), (rises, sets, statuses) in \
+                zip(cls.EVENT_TYPES, times):
+            result[name] = ([r - offset for r in rises[0]],
+                            [s + offset for s in sets[0]], statuses[0])
+        return result
+
+    @classmethod
+    def altitudeCrossingsRange(cls, year, month, day, days, lon, lat,
+                               altitudes, upper_limb=0, iterations=0):
+        """
+        This macro computes the times when the Sun's center (or upper limb,
+        if upper_limb is non-zero) rises and sets through each of the given
+        altitudes (degrees, negative below the horizon), for the given
+        number of days starting at year, month, day. For example, golden
+        hour ends at +6 degrees and blue hour starts at -4 degrees.
+        Returns a list with a (rises, sets, statuses) triple for each
+        altitude. The Sun's position is only computed once per day, however
+        many altitudes there are.
+        """
+        times = cls.__crossings(year, month, day, days, [lon], [lat],
+                                [(altit, upper_limb) for altit in altitudes],
+                                iterations)
+        return [(rises[0], sets[0], statuses[0])
+                for rises, sets, statuses in times]
+
+    @classmethod
+    def riseSetIter(cls, year, month, day, lon, lat, kind="sunRiseSet"):
+        """
+        A generator of the times the macro named kind (one of EVENT_TYPES)
+        would return for year, month, day and every day after it, as
+        (rise, set, status) tuples with status as for the *Range macros.
+
+        Rather than starting from scratch each day, this steps the Sun's
+        mean elements on from the day before (see __sunposIter), which
+        saves most of the trigonometry in __sunpos and __sunRADec. The
+        times agree with the single-day macros to within a microsecond.
+        """
+        name, altit, upper_limb, offset = cls.__eventType(kind)
+
+        # d of 12h local mean solar time on the first day, which is
+        # within half a day of Greenwich noon
+        lon = cls.__rev180(lon)
+        d = cls.__daysSince2000Jan0(year, month, day) + 0.5 - lon / 360.0
+
+        sin, acos, sqrt, atan2 = math.sin, math.acos, math.sqrt, math.atan2
+        floor = math.floor
+        radians, degrees = math.radians, math.degrees
+        sin_lat = sin(radians(lat))
+        cos_lat = math.cos(radians(lat))
+        sin_altit = sin(radians(altit))
+
+        for x, y, z, r in cls.__sunposIter(d):
+            # Local sidereal time and the time when the Sun is at south
+            sidtime = 180.0 + 356.0470 + 282.9404 + \
+                (0.9856002585 + 4.70935E-5) * d
+            sidtime = sidtime - 360.0 * floor(sidtime / 360.0) + 180.0 + lon
+            ha = sidtime - degrees(atan2(y, x))
+            tsouth = 12.0 - (ha - 360.0 * floor(ha / 360.0 + 0.5)) / 15.0
+            d += 1.0
+
+            # Sine and cosine of the declination, straight from the
+            # equatorial rectangular coordinates
+            sin_sdec = z / r
+            cos_sdec = sqrt(x * x + y * y) / r
+
+            if upper_limb:
+                sin_a = sin(radians(altit - 0.2666 / r))
+            else:
+                sin_a = sin_altit
+
+            cost = (sin_a - sin_lat * sin_sdec) / (cos_lat * cos_sdec)
+            if cost >= 1.0:
+                yield tsouth - offset, tsouth + offset, cls.ALWAYS_DOWN
+            elif cost <= -1.0:
+                yield (tsouth - 12.0 - offset, tsouth + 12.0 + offset,
+                       cls.ALWAYS_UP)
+            else:
+                t = degrees(acos(cost)) / 15.0   # The diurnal arc, hours
+                yield tsouth - t - offset, tsouth + t + offset, cls.RISES
+
+    @classmethod
+    def findDays(cls, year, month, day, days, lon, lat, hour,
+                 kind="sunRiseSet", which="set", after=True, step=7):
+        """
+        Find the days, out of the given number starting at year, month,
+        day, on which the rise (which="rise") or set (which="set") time of
+        the macro named kind (one of EVENT_TYPES) is after the given hour
+        UT, or before it if after is False. Days when the Sun doesn't
+        cross the altitude never match. Returns a list of (first, end)
+        datetime.date pairs, one for each run of matching days, where end
+        is the day after the last.
+
+        Rather than computing every day, this relies on the times changing
+        smoothly through the year: it only computes every step'th day,
+        and finds the day where the answer changes between two of those
+        by bisection. Runs of matching or non-matching days shorter than
+        step days may be missed.
+        """
+        name, altit, upper_limb, offset = cls.__eventType(kind)
+        start = datetime.date(year, month, day)
+        known = {}
+
+        def matches(k):
+            if k not in known:
+                date = start + datetime.timedelta(k)
+                (rises,), (sets,), (statuses,) = cls.__crossings(date.year,
+                    date.month, date.day, 1, [lon], [lat],
+                    [(altit, upper_limb)])[0]
+                if which == "rise":
+                    t = rises[0] - offset
+                else:
+                    t = sets[0] + offset
+                known[k] = statuses[0] == cls.RISES and (t > hour) == after
+            return known[k]
+
+        # The days on which the answer differs from the day before
+        changes = []
+        samples = list(range(0, days - 1, step)) + [days - 1]
+        for lo, hi in zip(samples, samples[1:]):
+            if matches(lo) == matches(hi):
+                continue
+            while hi - lo > 1:
+                mid = (lo + hi) // 2
+                if matches(mid) == matches(lo):
+                    lo = mid
+                else:
+                    hi = mid
+            changes.append(hi)
+
+        runs = []
+        first = None
+        if days and matches(0):
+            first = 0
+        for k in changes:
+            if first is None:
+                first = k
+            else:
+                runs.append((start + datetime.timedelta(first),
+                             start + datetime.timedelta(k)))
+                first = None
+        if first is not None:
+            runs.append((start + datetime.timedelta(first),
+                         start + datetime.timedelta(days)))
+        return runs
+
+    @classmethod
+    def findDaysLocations(cls, year, month, day, days, lons, lats, hour,
+                          kind="sunRiseSet", which="set", after=True,
+                          step=7):
+        """
+        The same as findDays, for many locations at once. Returns a list
+        of the runs of days for each location.
+        """
+        return [cls.findDays(year, month, day, days, lon, lat, hour, kind,
+                             which, after, step)
+                for lon, lat in zip(lons, lats)]
+
+    @classmethod
+    def altAzRange(cls, year, month, day, days, lon, lat, step=1.0):
+        """
+        This macro computes the altitude and azimuth of the Sun's center
+        every step minutes from 0h UT on each of the given number of days,
+        starting at year, month, day. Returns a list of altitudes and a
+        list of azimuths (degrees; azimuth is measured from north through
+        east) for each day. No account is made of refraction.
+        """
+        # Days since 2000 Jan 0 of the first day, and the table from noon
+        # at Greenwich the day before to noon on the last day
+        n = cls.__daysSince2000Jan0(year, month, day)
+        table = cls.__ephemeris(n - 1, days + 1)
+
+        sin, cos, asin, atan2 = math.sin, math.cos, math.asin, math.atan2
+        floor = math.floor
+        radians, degrees = math.radians, math.degrees
+        sin_lat = sin(radians(lat))
+        cos_lat = cos(radians(lat))
+        samples = int(round(24 * 60.0 / step))
+
+        altitudes = []
+        azimuths = []
+        for i in range(days):
+            day_altitudes = []
+            day_azimuths = []
+            for j in range(samples):
+                ut = j * step / 60.0
+
+                # The Sun's position at this moment; index 0 of the table
+                # is noon on the day before
+                x = i + 0.5 + ut / 24.0
+                k = int(x)
+                frac = x - k
+                sRA, sdec, sr, dRA, ddec, dsr = table[k]
+                sRA = sRA + frac * dRA
+                sdec = radians(sdec + frac * ddec)
+                sin_sdec = sin(sdec)
+                cos_sdec = cos(sdec)
+
+                # Local hour angle
+                gmst0 = 180.0 + 356.0470 + 282.9404 + \
+                    (0.9856002585 + 4.70935E-5) * (n + i + ut / 24.0)
+                ha = radians(gmst0 + 15.0 * ut + lon - sRA)
+                cos_ha = cos(ha)
+
+                day_altitudes.append(degrees(asin(
+                    sin_lat * sin_sdec + cos_lat * cos_sdec * cos_ha)))
+                az = degrees(atan2(-cos_sdec * sin(ha),
+                                   cos_lat * sin_sdec -
+                                   sin_lat * cos_sdec * cos_ha))
+                day_azimuths.append(az - 360.0 * floor(az / 360.0))
+            altitudes.append(day_altitudes)
+            azimuths.append(day_azimuths)
+
+        return altitudes, azimuths
+
+    @classmethod
+    def subsolarPoint(cls, year, month, day, hour):
+        """
+        Returns the longitude and latitude of the point where the Sun is
+        overhead at hour UT on year, month, day, and the Sun's distance.
+        """
+        d = cls.__daysSince2000Jan0(year, month, day) + hour / 24.0
+        sRA, sdec, sr = cls.__sunRADec(d)
+        # GMST0 is GMST - UT (see __GMST0)
+        return cls.__rev180(sRA - cls.__GMST0(d) - 15.0 * hour), sdec, sr
+
+    @classmethod
+    def terminator(cls, year, month, day, hour, altit=-35.0 / 60.0,
+                   points=360):
+        """
+        Returns the line on the Earth where the Sun's center is at altit
+        at hour UT on year, month, day, as a closed polyline of the given
+        number of (lon, lat) points. The default is the day/night
+        terminator at rise/set; use -6, -12 and -18 degrees for the edges
+        of the twilight bands. The line is the circle 90 - altit degrees
+        from the subsolar point.
+        """
+        lon0, lat0, sr = cls.subsolarPoint(year, month, day, hour)
+        sin, cos, asin, atan2 = math.sin, math.cos, math.asin, math.atan2
+        radians, degrees = math.radians, math.degrees
+        sin_lat0 = sin(radians(lat0))
+        cos_lat0 = cos(radians(lat0))
+        sin_rho = sin(radians(90.0 - altit))
+        cos_rho = cos(radians(90.0 - altit))
+
+        line = []
+        for i in range(points + 1):
+            bearing = 2.0 * math.pi * i / points
+            sin_lat = sin_lat0 * cos_rho + cos_lat0 * sin_rho * cos(bearing)
+            lon = lon0 + degrees(atan2(sin(bearing) * sin_rho * cos_lat0,
+                                       cos_rho - sin_lat0 * sin_lat))
+            line.append((cls.__rev180(lon), degrees(asin(sin_lat))))
+        return line
+
+    @classmethod
+    def solarAltitudes(cls, year, month, day, hour, lons, lats):
+        """
+        Returns the altitude of the Sun's center (degrees, no refraction)
+        at hour UT on year, month, day at each of the given locations,
+        and whether it is setting (True) or rising (False) at each.
+        """
+        d = cls.__daysSince2000Jan0(year, month, day) + hour / 24.0
+        sRA, sdec, sr = cls.__sunRADec(d)
+        gmst = cls.__GMST0(d) + 15.0 * hour
+
+        sin, cos, asin = math.sin, math.cos, math.asin
+        radians, degrees = math.radians, math.degrees
+        sin_sdec = sin(radians(sdec))
+        cos_sdec = cos(radians(sdec))
+
+        altitudes = []
+        setting = []
+        for lon, lat in zip(lons, lats):
+            ha = radians(gmst + lon - sRA)
+            lat = radians(lat)
+            altitudes.append(degrees(asin(sin(lat) * sin_sdec +
+                                          cos(lat) * cos_sdec * cos(ha))))
+            # Past the meridian when the hour angle is 0..180 degrees
+            setting.append(sin(ha) > 0.0)
+        return altitudes, setting
+
+    @classmethod
+    def inBand(cls, year, month, day, hour, lons, lats, lower, upper,
+               setting=None):
+        """
+        Returns the indices of the locations where the Sun's center is at
+        or above lower and below upper degrees at hour UT on year, month,
+        day. For example lower=-6, upper=-35/60 is civil twilight. If
+        setting is True (False) only the locations where the Sun is
+        setting (rising) are returned.
+        """
+        altitudes, sets = cls.solarAltitudes(year, month, day, hour, lons,
+                                             lats)
+        return [i for i, (a, s) in enumerate(zip(altitudes, sets))
+                if lower <= a < upper and (setting is None or s == setting)]
+
+    @classmethod
+    def events(cls, start, end, lon, lat, kinds=("sunRiseSet",),
+               iterations=0):
+        """
+        A generator of the events of the given kinds (names from
+        EVENT_TYPES) for the days from the date start up to, but not
+        including, the date end, or forever if end is None. Yields
+        (datetime, name) tuples in time order, where the datetime is in
+        UT (but naive) and the name comes from EVENT_NAMES. Days when the
+        Sun doesn't cross the altitude have no events.
+
+        The times are computed a month at a time and only held until no
+        later day can have an earlier event, so this needs the same
+        memory however long the range is.
+        """
+        types = [t for t in cls.EVENT_TYPES if t[0] in kinds]
+        if len(types) != len(kinds):
+            raise ValueError("Unknown kind of event in %r" % (kinds,))
+        altits = [(altit, upper_limb)
+                  for name, altit, upper_limb, offset in types]
+
+        first = datetime.datetime(start.year, start.month, start.day)
+        if end is not None:
+            end = datetime.datetime(end.year, end.month, end.day)
+
+        # No event is earlier than this many hours after 0h UT on its day:
+        # the Sun is at south at about 12 - lon / 15 hours, give or take
+        # the equation of time, and rises at most 12 hours before that.
+        earliest = -lon / 15.0 - 1.0 - max([t[3] for t in types] + [0.0])
+
+        pending = []
+        while end is None or first < end:
+            days = 31
+            if end is not None:
+                days = min(days, (end - first).days)
+            times = cls.__crossings(first.year, first.month, first.day, days,
+                                    [lon], [lat], altits, iterations)
+            for (name, altit, upper_limb, offset), (rises, sets, statuses) \
+                    in zip(types, times):
+                rise_name, set_name = cls.EVENT_NAMES[name]
+                for i in range(days):
+                    if statuses[0][i] != cls.RISES:
+                        continue
+                    heapq.heappush(pending, (first + datetime.timedelta(
+                        days=i, hours=rises[0][i] - offset), rise_name))
+                    heapq.heappush(pending, (first + datetime.timedelta(
+                        days=i, hours=sets[0][i] + offset), set_name))
+
+            first += datetime.timedelta(days)
+            horizon = first + datetime.timedelta(hours=earliest)
+            while pending and pending[0][0] < horizon:
+                yield heapq.heappop(pending)
+
+        while pending:
+            yield heapq.heappop(pending)
+
+    # The same macros again for many locations at once. lons and lats are
+    # sequences of the same length, and the result is three lists of lists,
+    # indexed first by location and then by day.
+
+    @classmethod
+    def sunRiseSetLocations(cls, year, month, day, days, lons, lats,
+                            iterations=0, elevations=None, refractions=None):
+        """
+        This macro computes times for sunrise/sunset at every location for
+        the given number of days, starting at year, month, day. The
+        optional elevations and refractions give each location's, as for
+        horizonAltitudes.
+        """
+        return cls.__sunrisetLocations(year, month, day, days, lons, lats,
+                -35.0 / 60.0, 1, iterations,
+                cls.__horizons(len(lons), elevations, refractions))
+
+    @classmethod
+    def aviationTimeLocations(cls, year, month, day, days, lons, lats,
+                              iterations=0, elevations=None,
+                              refractions=None):
+        """
+        This macro computes the first launch and last landing times at every
+        location for the given number of days, starting at year, month, day.
+        elevations and refractions are as for sunRiseSetLocations.
+        """
+        rises, sets, statuses = cls.__sunrisetLocations(year, month, day,
+                days, lons, lats, -35.0 / 60.0, 1, iterations,
+                cls.__horizons(len(lons), elevations, refractions))
+        return ([[r - 0.5 for r in row] for row in rises],
+                [[s + 0.5 for s in row] for row in sets], statuses)
+
+    @classmethod
+    def civilTwilightLocations(cls, year, month, day, days, lons, lats,
+                               iterations=0):
+        """
+        This macro computes the start and end times of civil twilight at
+        every location for the given number of days.
+        """
+        return cls.__sunrisetLocations(year, month, day, days, lons, lats,
+                                       -6.0, 0, iterations)
+
+    @classmethod
+    def nauticalTwilightLocations(cls, year, month, day, days, lons, lats,
+                                  iterations=0):
+        """
+        This macro computes the start and end times of nautical twilight at
+        every location for the given number of days.
+        """
+        return cls.__sunrisetLocations(year, month, day, days, lons, lats,
+                                       -12.0, 0, iterations)
+
+    @classmethod
+    def astronomicalTwilightLocations(cls, year, month, day, days, lons,
+                                      lats, iterations=0):
+        """
+        This macro computes the start and end times of astronomical twilight
+        at every location for the given number of days.
+        """
+        return cls.__sunrisetLocations(year, month, day, days, lons, lats,
+                                       -18.0, 0, iterations)
+
+    @staticmethod
+    def horizonAltitudes(elevations, refractions=None):
+        """
+        Returns the altitude of the Sun's upper limb at sunrise/sunset for
+        observers at each of the given elevations (metres above the
+        surrounding ground or sea), where the horizon refracts light by
+        each of the given refractions (arc minutes, 35 by default as in
+        sunRiseSet). A raised observer sees past the geometric horizon by
+        the dip, about 1.76 arc minutes times the square root of the
+        elevation, so the Sun rises earlier and sets later.
+        """
+        if refractions is None:
+            refractions = [35.0] * len(elevations)
+        sqrt = math.sqrt
+        return [-(refraction + 1.76 * sqrt(max(elevation, 0.0))) / 60.0
+                for elevation, refraction in zip(elevations, refractions)]
+
+    @classmethod
+    def __horizons(cls, locations, elevations, refractions):
+        """The per-location corrections to the standard -35 arc minute
+        altitude for the given elevations and refractions, or None if
+        neither is given."""
+        if elevations is None and refractions is None:
+            return None
+        if elevations is None:
+            elevations = [0.0] * locations
+        return [altit + 35.0 / 60.0
+                for altit in cls.horizonAltitudes(elevations, refractions)]
+
+    @classmethod
+    def __eventType(cls, kind):
+        """Return the entry of EVENT_TYPES for the macro named kind."""
+        for event_type in cls.EVENT_TYPES:
+            if event_type[0] == kind:
+                return event_type
+        raise ValueError("Unknown kind of event %r" % kind)
+
     # The "workhorse" function for sun rise/set times
     @classmethod
     def __sunriset(cls, year, month, day, lon, lat, altit, upper_limb):
         """
-        Note: year,month,date = calendar date, 1801-2099 only.
+        Note: year,month,date = calendar date (proleptic Gregorian).
               Eastern longitude positive, Western longitude negative
               Northern latitude positive, Southern latitude negative
               The longitude value IS critical in this function!
@@ -156,6 +787,19 @@ class Sun:
                            'Day' length = 0 hours, *trise and *tset are
                             both set to the time when the sun is at south.
         """
+        return cls.__sunrisetMulti(year, month, day, lon, lat,
+                                   [(altit, upper_limb)])[0]
+
+    @classmethod
+    def __sunrisetMulti(cls, year, month, day, lon, lat, altits):
+        """
+        The same as __sunriset, for a list of (altit, upper_limb) pairs.
+        Returns a list with one (rise, set) pair for each of them. The
+        Sun's position is computed only once.
+        """
+        # Local noon is within half a day of Greenwich noon
+        lon = cls.__rev180(lon)
+
         # Compute d of 12h local mean solar time
         d = cls.__daysSince2000Jan0(year, month, day) + 0.5 - (lon / 360.0)
 
@@ -171,30 +815,233 @@ class Sun:
         # Compute the Sun's apparent radius, degrees
         sradius = 0.2666 / sr
 
-        # Do correction to upper limb, if necessary
-        if upper_limb:
-            altit = altit - sradius
+        times = []
+        for altit, upper_limb in altits:
+            # Do correction to upper limb, if necessary
+            if upper_limb:
+                altit = altit - sradius
 
-        # Compute the diurnal arc that the Sun traverses to reach
-        # the specified altitude altit:
+            # Compute the diurnal arc that the Sun traverses to reach
+            # the specified altitude altit:
 
-        cost = (cls.__sind(altit) - cls.__sind(lat) * cls.__sind(sdec)) / \
-               (cls.__cosd(lat) * cls.__cosd(sdec))
+            cost = (cls.__sind(altit) - cls.__sind(lat) * cls.__sind(sdec)) / \
+                   (cls.__cosd(lat) * cls.__cosd(sdec))
 
-        if cost >= 1.0:
-            t = 0.0           # Sun always below altit
-        elif cost <= -1.0:
-            t = 12.0         # Sun always above altit
-        else:
-            t = cls.__acosd(cost) / 15.0   # The diurnal arc, hours
+            if cost >= 1.0:
+                t = 0.0           # Sun always below altit
+            elif cost <= -1.0:
+                t = 12.0         # Sun always above altit
+            else:
+                t = cls.__acosd(cost) / 15.0   # The diurnal arc, hours
+
+            # Store rise and set times - in hours UT
+            times.append((tsouth - t, tsouth + t))
+
+        return times
 
-        # Store rise and set times - in hours UT
-        return (tsouth - t, tsouth + t)
+    @classmethod
+    def __sunrisetRange(cls, year, month, day, days, lon, lat, altit,
+                        upper_limb, iterations=0):
+        """
+        The same as __sunriset, but for the given number of consecutive
+        days starting at year, month, day. Returns a list of rise times, a
+        list of set times (in hours UT relative to the start of each day)
+        and a list of statuses (RISES, ALWAYS_UP or ALWAYS_DOWN).
+        """
+        rises, sets, statuses = cls.__sunrisetLocations(year, month, day,
+                days, [lon], [lat], altit, upper_limb, iterations)
+        return rises[0], sets[0], statuses[0]
+
+    @classmethod
+    def __sunrisetLocations(cls, year, month, day, days, lons, lats, altit,
+                            upper_limb, iterations=0, horizons=None):
+        """
+        The same as __sunrisetRange, for many locations at once. Returns
+        lists of lists of rise times, set times and statuses, indexed by
+        location and then by day. horizons is as for __crossings.
+        """
+        return cls.__crossings(year, month, day, days, lons, lats,
+                               [(altit, upper_limb)], iterations,
+                               horizons)[0]
+
+    @classmethod
+    def __crossings(cls, year, month, day, days, lons, lats, altits,
+                    iterations=0, horizons=None):
+        """
+        The workhorse behind the *Range and *Locations macros. altits is a
+        list of (altit, upper_limb) pairs, as for __sunriset. Returns a
+        list with one (rises, sets, statuses) triple for each of them,
+        where each is a list of lists indexed by location and then by
+        day. The statuses are RISES, ALWAYS_UP or ALWAYS_DOWN, and the
+        times on ALWAYS_UP and ALWAYS_DOWN days are as for __sunriset.
+
+        The Sun's position depends only on d, and the d of local noon
+        differs between locations only by lon / 360 (at most half a day
+        either way). So the position is taken from the shared table of
+        positions at noon at Greenwich (see __ephemeris), and each
+        location interpolates linearly between the two days which
+        surround its own local noon. This moves the times by a second or
+        two (a few more in the days when the Sun only just reaches altit),
+        far less than the error in the algorithm itself. Everything but
+        the diurnal arc is computed once per location and day, however
+        many altitudes are asked for.
+
+        Like __sunriset, this takes the Sun's position at local noon to
+        hold all day. If iterations is non-zero, each time is then refined
+        by __refine, using the Sun's position at the time itself.
+
+        horizons optionally gives a correction (degrees) for each
+        location which is added to every altit there, e.g. for the dip of
+        the horizon (see __horizons). It is applied once per location, not
+        per day.
+        """
+        # Days since 2000 Jan 0 of the day before the first
+        n = cls.__daysSince2000Jan0(year, month, day) - 1
+        # Noon at Greenwich from two days before the first day to the day
+        # after the last; refined times can be up to a day from noon.
+        table = cls.__ephemeris(n - 1, days + 3)
+
+        sin, cos, acos = math.sin, math.cos, math.acos
+        floor = math.floor
+        radians, degrees = math.radians, math.degrees
+        RISES, ALWAYS_UP, ALWAYS_DOWN = \
+            cls.RISES, cls.ALWAYS_UP, cls.ALWAYS_DOWN
+        if horizons is None:
+            horizons = [0.0] * len(lons)
+
+        results = [([], [], []) for altit in altits]
+        for lon, lat, horizon in zip(lons, lats, horizons):
+            # The table only reaches a day either side of Greenwich noon
+            lon = cls.__rev180(lon)
+            # The altitudes at this location
+            local_altits = [(altit + horizon, upper_limb)
+                            for altit, upper_limb in altits]
+            sin_altits = [sin(radians(altit))
+                          for altit, upper_limb in local_altits]
+
+            # Offset of local noon from Greenwich noon two days before the
+            # first, in days, as an index into the table plus a fraction
+            shift = 2.0 - lon / 360.0
+            k0 = int(floor(shift))
+            frac = shift - k0
+
+            sin_lat = sin(radians(lat))
+            cos_lat = cos(radians(lat))
+
+            rows = [([], [], []) for altit in altits]
+            for i in range(days):
+                sRA, sdec, sr, dRA, ddec, dsr = table[i + k0]
+                sRA = sRA + frac * dRA
+                sdec = radians(sdec + frac * ddec)
+                sin_lat_sdec = sin_lat * sin(sdec)
+                cos_lat_sdec = cos_lat * cos(sdec)
+
+                # Local sidereal time and the time when the Sun is at south
+                gmst0 = 180.0 + 356.0470 + 282.9404 + \
+                    (0.9856002585 + 4.70935E-5) * (n - 0.5 + i + shift)
+                gmst0 = gmst0 - 360.0 * floor(gmst0 / 360.0)
+                sidtime = gmst0 + 180.0 + lon
+                sidtime = sidtime - 360.0 * floor(sidtime / 360.0)
+                x = sidtime - sRA
+                tsouth = 12.0 - (x - 360.0 * floor(x / 360.0 + 0.5)) / 15.0
+
+                # The Sun's apparent radius, degrees
+                sradius = 0.2666 / (sr + frac * dsr)
+
+                for j, (altit, upper_limb) in enumerate(local_altits):
+                    # Correct to the upper limb, if necessary
+                    if upper_limb:
+                        sin_a = sin(radians(altit - sradius))
+                    else:
+                        sin_a = sin_altits[j]
+
+                    cost = (sin_a - sin_lat_sdec) / cos_lat_sdec
+
+                    if cost >= 1.0:
+                        t = 0.0           # Sun always below altit
+                        status = ALWAYS_DOWN
+                    elif cost <= -1.0:
+                        t = 12.0         # Sun always above altit
+                        status = ALWAYS_UP
+                    else:
+                        t = degrees(acos(cost)) / 15.0   # The diurnal arc
+                        status = RISES
+
+                    rises, sets, statuses = rows[j]
+                    statuses.append(status)
+                    if iterations and status == RISES:
+                        rises.append(cls.__refine(table, n + 1 + i,
+                                i + 1.5, lon, sin_lat, cos_lat, altit,
+                                upper_limb, tsouth - t, -1.0, iterations))
+                        sets.append(cls.__refine(table, n + 1 + i,
+                                i + 1.5, lon, sin_lat, cos_lat, altit,
+                                upper_limb, tsouth + t, 1.0, iterations))
+                    else:
+                        rises.append(tsouth - t)
+                        sets.append(tsouth + t)
+
+            for result, row in zip(results, rows):
+                for all_values, values in zip(result, row):
+                    all_values.append(values)
+
+        return results
+
+    @staticmethod
+    def __refine(table, d0, k0, lon, sin_lat, cos_lat, altit, upper_limb,
+                 time, sign, iterations):
+        """
+        Refine a rise (sign -1) or set (sign +1) time, in hours UT on the
+        day d0 (days since 2000 Jan 0), for the Sun's motion during the
+        day. The Sun's position is interpolated from the ephemeris table
+        at the current estimate of the time, where index k0 of the table
+        is the start of the day, and the time recomputed from it. This
+        is repeated until the time changes by less than a tenth of a
+        second, or at most iterations times. If the Sun does not reach
+        altit at some estimate, the latest time is returned as it is.
+        """
+        sin, cos, acos = math.sin, math.cos, math.acos
+        floor = math.floor
+        radians, degrees = math.radians, math.degrees
+
+        for it in range(iterations):
+            # The Sun's position at this time
+            x = k0 + time / 24.0
+            k = int(floor(x))
+            frac = x - k
+            sRA, sdec, sr, dRA, ddec, dsr = table[k]
+            sRA = sRA + frac * dRA
+            sdec = radians(sdec + frac * ddec)
+
+            # The time when the Sun is at south, were it to stay there
+            gmst0 = 180.0 + 356.0470 + 282.9404 + \
+                (0.9856002585 + 4.70935E-5) * (d0 + time / 24.0)
+            gmst0 = gmst0 - 360.0 * floor(gmst0 / 360.0)
+            sidtime = gmst0 + 180.0 + lon
+            sidtime = sidtime - 360.0 * floor(sidtime / 360.0)
+            x = sidtime - sRA
+            tsouth = 12.0 - (x - 360.0 * floor(x / 360.0 + 0.5)) / 15.0
+
+            if upper_limb:
+                a = altit - 0.2666 / (sr + frac * dsr)
+            else:
+                a = altit
+
+            cost = (sin(radians(a)) - sin_lat * sin(sdec)) / \
+                   (cos_lat * cos(sdec))
+            if not -1.0 < cost < 1.0:
+                break
+
+            previous = time
+            time = tsouth + sign * degrees(acos(cost)) / 15.0
+            if abs(time - previous) < 0.1 / 3600.0:
+                break
+
+        return time
 
     @classmethod
     def __daylen(cls, year, month, day, lon, lat, altit, upper_limb):
         """
-        Note: year,month,date = calendar date, 1801-2099 only.
+        Note: year,month,date = calendar date (proleptic Gregorian).
               Eastern longitude positive, Western longitude negative
               Northern latitude positive, Southern latitude negative
               The longitude value is not critical. Set it to the correct
@@ -267,6 +1114,65 @@ class Sun:
 
         return lon, r
 
+    @staticmethod
+    def __sunposIter(d):
+        """
+        A generator of the Sun's equatorial rectangular coordinates
+        (x, y, z) and distance r at d, d + 1, d + 2, ... as computed by
+        __sunpos and __sunRADec.
+
+        The mean anomaly, the argument of perihelion and the obliquity all
+        change by a fixed angle each day, so their sines and cosines are
+        stepped on with the angle addition formulae, and the eccentric
+        anomaly is found as a small correction to the mean anomaly. The
+        true longitude never needs to be computed as an angle, since only
+        its sine and cosine are used. Every 32 days everything is
+        recomputed from d to stop rounding errors from building up.
+        """
+        sin, cos, sqrt = math.sin, math.cos, math.sqrt
+        radians = math.radians
+
+        # The daily steps of M, w and the obliquity
+        sin_dM, cos_dM = sin(radians(0.9856002585)), cos(radians(0.9856002585))
+        sin_dw, cos_dw = sin(radians(4.70935e-5)), cos(radians(4.70935e-5))
+        sin_do, cos_do = sin(radians(-3.563e-7)), cos(radians(-3.563e-7))
+
+        while True:
+            M = radians(356.0470 + 0.9856002585 * d)
+            w = radians(282.9404 + 4.70935e-5 * d)
+            obl_ecl = radians(23.4393 - 3.563e-7 * d)
+            sin_M, cos_M = sin(M), cos(M)
+            sin_w, cos_w = sin(w), cos(w)
+            sin_o, cos_o = sin(obl_ecl), cos(obl_ecl)
+
+            for i in range(32):
+                e = 0.016709 - 1.151e-9 * d
+
+                # Eccentric anomaly E = M + a, with a at most about 1 deg,
+                # so its sine and cosine are found from short series
+                a = e * sin_M * (1.0 + e * cos_M)
+                a2 = a * a
+                sin_a = a * (1.0 - a2 / 6.0 * (1.0 - a2 / 20.0))
+                cos_a = 1.0 - a2 / 2.0 * (1.0 - a2 / 12.0 * (1.0 - a2 / 30.0))
+                cos_E = cos_M * cos_a - sin_M * sin_a
+                sin_E = sin_M * cos_a + cos_M * sin_a
+
+                # Position in the plane of the orbit, then rotated by w to
+                # ecliptic coordinates and by the obliquity to equatorial
+                x = cos_E - e
+                y = sqrt(1.0 - e * e) * sin_E
+                r = sqrt(x * x + y * y)
+                x, y = x * cos_w - y * sin_w, x * sin_w + y * cos_w
+                yield x, y * cos_o, y * sin_o, r
+
+                d += 1.0
+                sin_M, cos_M = (sin_M * cos_dM + cos_M * sin_dM,
+                                cos_M * cos_dM - sin_M * sin_dM)
+                sin_w, cos_w = (sin_w * cos_dw + cos_w * sin_dw,
+                                cos_w * cos_dw - sin_w * sin_dw)
+                sin_o, cos_o = (sin_o * cos_do + cos_o * sin_do,
+                                cos_o * cos_do - sin_o * sin_do)
+
     @classmethod
     def __sunRADec(cls, d):
         """
@@ -274,6 +1180,10 @@ class Sun:
         the declination (dec) and the distance of the Sun (r)
         for a given day d.
         """
+        if cls.__chebyshev is not None:
+            position = cls.__sunRADecChebyshev(d)
+            if position is not None:
+                return position
 
         # Compute Sun's ecliptical coordinates
         lon, r = cls.__sunpos(d)
@@ -292,6 +1202,264 @@ class Sun:
         # Convert to spherical coordinates
         return cls.__atan2d(y, x), cls.__atan2d(z, math.hypot(x, y)), r
 
+    # The Chebyshev ephemeris read from Sunephem.dat by setEphemeris, as
+    # (first day, segment length, list of segments), or None to use the
+    # formulae above. Each segment is a tuple of the coefficients for the
+    # declination, the equation of time and the distance.
+    __chebyshev = None
+
+    @classmethod
+    def setEphemeris(cls, ephemeris="kepler", filename=None):
+        """
+        Choose how the Sun's position is computed. "kepler" (the default)
+        solves Kepler's equation every time, as above. "chebyshev" instead
+        evaluates Chebyshev polynomials fitted to the same formulae, read
+        from filename (by default Sunephem.dat next to this file, which
+        mkSunephem.py generates). The polynomials cover 1801-2099 and agree
+        with the formulae to well under a second of time; outside that
+        range the formulae are used anyway.
+        """
+        if ephemeris == "kepler":
+            cls.__chebyshev = None
+        elif ephemeris == "chebyshev":
+            if filename is None:
+                filename = os.path.join(os.path.dirname(
+                    os.path.abspath(__file__)), "Sunephem.dat")
+            cls.__chebyshev = cls.__loadChebyshev(filename)
+        else:
+            raise ValueError("Unknown ephemeris %r" % ephemeris)
+        cls.__ephemerisCache.clear()
+
+    @staticmethod
+    def __loadChebyshev(filename):
+        """Read a Chebyshev ephemeris written by mkSunephem.py."""
+        f = open(filename, "rb")
+        try:
+            header = f.read(struct.calcsize("<4sddiiii"))
+            data = f.read()
+        finally:
+            f.close()
+        magic, first, length, count, ndec, neot, nr = \
+            struct.unpack("<4sddiiii", header)
+        if magic != b"SEPH":
+            raise ValueError("%s is not a Sun ephemeris file" % filename)
+        if max(ndec, neot, nr) > 6:
+            # __sunRADecRangeChebyshev steps through five differences
+            raise ValueError("%s has polynomials of too high a degree" %
+                             filename)
+
+        coefficients = array.array('f')
+        coefficients.fromstring(data)
+        if sys.byteorder != "little":
+            coefficients.byteswap()
+        coefficients = coefficients.tolist()
+
+        segments = []
+        size = ndec + neot + nr
+        for k in range(count):
+            c = coefficients[k * size:(k + 1) * size]
+            segments.append((c[:ndec], c[ndec:ndec + neot], c[ndec + neot:]))
+        return first, length, segments
+
+    @classmethod
+    def __sunRADecChebyshev(cls, d):
+        """
+        The same as __sunRADec, using the Chebyshev ephemeris. Returns None
+        if d is outside the range it covers.
+        """
+        first, length, segments = cls.__chebyshev
+        k = int(math.floor((d - first) / length))
+        if not 0 <= k < len(segments):
+            return None
+        t = 2.0 * (d - first - k * length) / length - 1.0
+
+        values = []
+        for c in segments[k]:
+            # Clenshaw's recurrence
+            b1 = b2 = 0.0
+            for ck in c[:0:-1]:
+                b1, b2 = 2.0 * t * b1 - b2 + ck, b1
+            values.append(t * b1 - b2 + c[0])
+        sdec, eot, sr = values
+
+        # RA is the Sun's mean longitude plus the equation of time
+        return (cls.__rev180(356.0470 + 282.9404 +
+                             (0.9856002585 + 4.70935E-5) * d + eot),
+                sdec, sr)
+
+    @classmethod
+    def __sunRADecRangeChebyshev(cls, d, days):
+        """
+        The same as __sunRADecRange, using the Chebyshev ephemeris. Each
+        polynomial is evaluated at the first six days which fall in its
+        segment, and then stepped from day to day by adding up its
+        forward differences, which are exact for polynomials of degree
+        five or less. Days outside the ephemeris use __sunRADec.
+        """
+        first, length, segments = cls.__chebyshev
+        floor = math.floor
+
+        sRAs = []
+        sdecs = []
+        srs = []
+        i = 0
+        while i < days:
+            di = d + i
+            k = int(floor((di - first) / length))
+            if not 0 <= k < len(segments):
+                sRA, sdec, sr = cls.__sunRADec(di)
+                sRAs.append(sRA)
+                sdecs.append(sdec)
+                srs.append(sr)
+                i += 1
+                continue
+
+            # The number of days from di which fall in this segment
+            count = min(days - i,
+                        int(math.ceil(first + (k + 1) * length - di)))
+            t0 = 2.0 * (di - first - k * length) / length - 1.0
+            dt = 2.0 / length
+            a0, a1, a2, a3, a4, a5 = \
+                cls.__chebyshevDifferences(segments[k][0], t0, dt)
+            b0, b1, b2, b3, b4, b5 = \
+                cls.__chebyshevDifferences(segments[k][1], t0, dt)
+            c0, c1, c2, c3, c4, c5 = \
+                cls.__chebyshevDifferences(segments[k][2], t0, dt)
+
+            # RA is the Sun's mean longitude plus the equation of time
+            L = 356.0470 + 282.9404 + (0.9856002585 + 4.70935E-5) * di
+            for j in range(count):
+                x = L + b0
+                sRAs.append(x - 360.0 * floor(x / 360.0 + 0.5))
+                sdecs.append(a0)
+                srs.append(c0)
+                L += 0.9856002585 + 4.70935E-5
+                a0 += a1
+                a1 += a2
+                a2 += a3
+                a3 += a4
+                a4 += a5
+                b0 += b1
+                b1 += b2
+                b2 += b3
+                b3 += b4
+                b4 += b5
+                c0 += c1
+                c1 += c2
+                c2 += c3
+                c3 += c4
+                c4 += c5
+            i += count
+
+        return sRAs, sdecs, srs
+
+    @staticmethod
+    def __chebyshevDifferences(c, t0, dt):
+        """The Chebyshev series c at t0 and its first five forward
+        differences with step dt."""
+        values = []
+        for j in range(6):
+            t = t0 + j * dt
+            # Clenshaw's recurrence
+            b1 = b2 = 0.0
+            for ck in c[:0:-1]:
+                b1, b2 = 2.0 * t * b1 - b2 + ck, b1
+            values.append(t * b1 - b2 + c[0])
+        differences = []
+        for j in range(6):
+            differences.append(values[0])
+            values = [b - a for a, b in zip(values, values[1:])]
+        return differences
+
+    # The Sun's position at noon at Greenwich, shared by every caller in
+    # the process. Maps days since 2000 Jan 0 to a tuple of RA, decl and
+    # distance followed by the change in each over the following day.
+    # Emptied whenever it would grow past ephemerisCacheSize days, and
+    # not used for requests of more days than that.
+    __ephemerisCache = {}
+    ephemerisCacheSize = 36600
+
+    @classmethod
+    def __ephemeris(cls, n, days):
+        """
+        Returns the entries of the ephemeris cache for the days n, n + 1,
+        ... n + days - 1 (days since 2000 Jan 0), computing them with
+        __sunRADecRange if any are missing.
+        """
+        cache = cls.__ephemerisCache
+        try:
+            return [cache[k] for k in range(n, n + days)]
+        except KeyError:
+            pass
+
+        sRAs, sdecs, srs = cls.__sunRADecRange(n + 0.5, days + 1)
+        table = []
+        for k in range(days):
+            # RA is taken the short way round
+            dRA = sRAs[k + 1] - sRAs[k]
+            dRA = dRA - 360.0 * math.floor(dRA / 360.0 + 0.5)
+            table.append((sRAs[k], sdecs[k], srs[k], dRA,
+                          sdecs[k + 1] - sdecs[k], srs[k + 1] - srs[k]))
+
+        # Requests longer than the whole cache aren't cached at all
+        if days <= cls.ephemerisCacheSize:
+            if len(cache) + days > cls.ephemerisCacheSize:
+                cache.clear()
+            cache.update(zip(range(n, n + days), table))
+        return table
+
+    @classmethod
+    def __sunRADecRange(cls, d, days):
+        """
+        The same as __sunRADec (and __sunpos), for the days d, d + 1, ...
+        d + days - 1. Returns three lists: RA, declination and distance.
+        The arithmetic is identical to the single-day functions, but the
+        function lookups are done once rather than once per day.
+        """
+        if cls.__chebyshev is not None:
+            return cls.__sunRADecRangeChebyshev(d, days)
+
+        sin, cos, sqrt = math.sin, math.cos, math.sqrt
+        atan2, hypot, floor = math.atan2, math.hypot, math.floor
+        radians, degrees = math.radians, math.degrees
+
+        sRAs = []
+        sdecs = []
+        srs = []
+        for i in range(days):
+            di = d + i
+
+            # Mean elements
+            M = 356.0470 + 0.9856002585 * di
+            M = M - 360.0 * floor(M / 360.0)
+            w = 282.9404 + 4.70935e-5 * di
+            e = 0.016709 - 1.151e-9 * di
+
+            # True longitude and radius vector
+            Mr = radians(M)
+            E = M + degrees(e) * sin(Mr) * (1.0 + e * cos(Mr))
+            Er = radians(E)
+            x = cos(Er) - e
+            y = sqrt(1.0 - e * e) * sin(Er)
+            r = hypot(x, y)
+            lon = degrees(atan2(y, x)) + w
+            if lon >= 360.0:
+                lon -= 360.0
+
+            # Ecliptic, then equatorial, rectangular coordinates
+            lonr = radians(lon)
+            x = r * cos(lonr)
+            y = r * sin(lonr)
+            obl_ecl = radians(23.4393 - 3.563e-7 * di)
+            z = y * sin(obl_ecl)
+            y = y * cos(obl_ecl)
+
+            sRAs.append(degrees(atan2(y, x)))
+            sdecs.append(degrees(atan2(z, hypot(x, y))))
+            srs.append(r)
+
+        return sRAs, sdecs, srs
+
     @staticmethod
     def __revolution(x):
         """
@@ -398,6 +1566,57 @@ class Sun:
 
         return fSFT
 
+    @classmethod
+    def solarFluxTable(cls, dates, latitudes):
+        """
+        Compute the maximal solar flux to reach the ground (W/M^2, as for
+        __get_max_solar_flux) for every date and latitude, and the
+        correction for the equation of time (radians, as for
+        __equation_of_time) for every date. dates is a sequence of
+        datetime.date (or anything with year, month and day attributes).
+        Returns a list of lists of fluxes, indexed by date and then by
+        latitude, and a list of equations of time.
+
+        Everything which depends only on the date or only on the latitude
+        is computed once.
+        """
+        sin, cos, pi = math.sin, math.cos, math.pi
+        sin_lats = [cls.__sind(latitude) for latitude in latitudes]
+        cos_lats = [cls.__cosd(latitude) for latitude in latitudes]
+
+        fluxes = []
+        eots = []
+        for date in dates:
+            nJulianDate = cls.__julian(date.year, date.month, date.day)
+            fDivide = 2.0 * pi / (calendar.isleap(date.year) and 366.0 or
+                                  365.0)
+            fA = nJulianDate * fDivide
+            fR0r = cls.__solcons(fA) * 0.1367e4
+            fRdecl = 0.412 * cos((nJulianDate + 10.0) * fDivide - pi)
+            sin_decl = sin(fRdecl) * fR0r
+            cos_decl = cos(fRdecl) * fR0r
+
+            row = []
+            for sin_lat, cos_lat in zip(sin_lats, cos_lats):
+                fSF = sin_lat * sin_decl + cos_lat * cos_decl
+                # In the case of a negative declination, solar flux is null
+                if fSF < 0:
+                    row.append(0)
+                    continue
+                fSFT = fSF * (-1.56e-12 * fSF ** 4 + 5.972e-9 * fSF ** 3 -
+                              8.364e-6 * fSF ** 2 + 5.183e-3 * fSF - 0.435)
+                row.append(max(fSFT, 0))
+            fluxes.append(row)
+
+            fEot = (0.002733
+                   - 7.3430 * sin(fA)       + 0.55190 * cos(fA)
+                   - 9.4700 * sin(2.0 * fA) - 3.02000 * cos(2.0 * fA)
+                   - 0.3289 * sin(3.0 * fA) - 0.07581 * cos(3.0 * fA)
+                   - 0.1935 * sin(4.0 * fA) - 0.12450 * cos(4.0 * fA))
+            eots.append(math.radians(fEot * 15.0 / 60.0))
+
+        return fluxes, eots
+
     @classmethod
     def __equation_of_time(cls, year, month, day, latitude):
         """
@@ -474,9 +1693,48 @@ class Sun:
     @staticmethod
     def __daysSince2000Jan0(y, m, d):
         """A macro to compute the number of days elapsed since 2000 Jan 0.0
-           (which is equal to 1999 Dec 31, 0h UT)"""
-        return 367 * y - 7 * (y + (m + 9) / 12) / 4 + \
-               275 * m / 9 + d - 730530
+           (which is equal to 1999 Dec 31, 0h UT), exactly for any date of
+           the proleptic Gregorian calendar"""
+        # Count from March 1 so that the leap day ends the year, in 400
+        # year eras of 146097 days. Floor division keeps this exact for
+        # negative years too.
+        if m <= 2:
+            y -= 1
+            m += 9
+        else:
+            m -= 3
+        era = y // 400
+        yoe = y - era * 400
+        return era * 146097 + yoe * 365 + yoe // 4 - yoe // 100 + \
+               (153 * m + 2) // 5 + d - 730425
+
+    @classmethod
+    def dayNumbers(cls, years, months, days):
+        """
+        Returns the number of days since 2000 Jan 0.0 (as the other macros
+        use internally) of each date given by the sequences years, months
+        and days, for any date of the proleptic Gregorian calendar. Raises
+        ValueError if a date does not exist.
+        """
+        lengths = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+        numbers = []
+        append = numbers.append
+        for y, m, d in zip(years, months, days):
+            if not 1 <= m <= 12 or d < 1 or (d > lengths[m - 1] and not (
+                    m == 2 and d == 29 and y % 4 == 0 and
+                    (y % 100 != 0 or y % 400 == 0))):
+                raise ValueError("%d-%02d-%02d is not a date" % (y, m, d))
+            # As __daysSince2000Jan0
+            if m <= 2:
+                y -= 1
+                m += 9
+            else:
+                m -= 3
+            era = y // 400
+            yoe = y - era * 400
+            append(era * 146097 + yoe * 365 + yoe // 4 - yoe // 100 +
+                   (153 * m + 2) // 5 + d - 730425)
+        return numbers
 
     # The trigonometric functions in degrees
     @staticmethod
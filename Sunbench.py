@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+Benchmarks for the Sun module.
+
+speed measures the events computed per second by the scalar macros, each
+of the batch paths and Suncal end to end (if index.py can be imported),
+at each of LOCATIONS, which run from the equator to both polar regions.
+
+accuracy compares the batch paths against the reference times in
+Sunref.csv, which mkSunref.py computes independently of Sun.py with a
+more accurate solar position (see there), and reports the mean and
+largest errors in minutes and the days where the Sun is wrongly taken to
+rise and set (or not).
+
+refinement compares the cost per event of the single-pass range macros,
+which take the Sun's position at local noon to hold all day, against the
+refined mode (iterations=n), and shows how far the refinement moves the
+times.
+
+Usage: python Sunbench.py [speed|accuracy|refinement] [days]
+"""
+
+import os
+import sys
+import csv
+import time
+import datetime
+
+from Sun import Sun
+
+# (name, lon, lat): the default Edinburgh location and a few others
+LOCATIONS = (("Edinburgh", -3.177664, 55.932756),
+             ("Equator", 0.0, 0.0),
+             ("Tromsø", 18.95, 69.65),
+             ("Hobart", 147.33, -42.88),
+             ("Longyearbyen", 15.65, 78.22),
+             ("McMurdo", 166.67, -77.85))
+
+REFERENCE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         "Sunref.csv")
+
+
+def timed(f, *args, **kwargs):
+    """Call f and return its result and the best time of three runs."""
+    best = None
+    for run in range(3):
+        start = time.time()
+        result = f(*args, **kwargs)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return result, best
+
+
+def cold(ephemeris, f, *args):
+    """As timed, but with the given ephemeris and an empty cache of the
+    Sun's positions for each run, as a new process would have."""
+    best = None
+    for run in range(3):
+        Sun.setEphemeris(ephemeris)
+        start = time.time()
+        result = f(*args)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    Sun.setEphemeris("kepler")
+    return result, best
+
+
+def scalar(days, lon, lat):
+    """sunRiseSet for each day in turn, as the original code did."""
+    start = datetime.date(2010, 1, 1)
+    times = []
+    for k in range(days):
+        date = start + datetime.timedelta(k)
+        times.append(Sun.sunRiseSet(date.year, date.month, date.day, lon,
+                                    lat))
+    return times
+
+
+def ranged(days, lon, lat, iterations=0):
+    """sunRiseSetRange for the given number of days."""
+    return Sun.sunRiseSetRange(2010, 1, 1, days, lon, lat, iterations)
+
+
+def refined(days, lon, lat):
+    """sunRiseSetRange, refined twice."""
+    return ranged(days, lon, lat, 2)
+
+
+def iterated(days, lon, lat):
+    """riseSetIter for the given number of days."""
+    times = []
+    for times_of_day in Sun.riseSetIter(2010, 1, 1, lon, lat):
+        times.append(times_of_day)
+        if len(times) == days:
+            break
+    return times
+
+
+def suncal():
+    """index.Suncal, or None if index.py can't be imported here."""
+    try:
+        from index import Suncal
+    except ImportError:
+        return None
+    return Suncal
+
+
+def speed(days=365):
+    """Events per second of each way of computing sunrise/sunset."""
+    print("Sunrise/sunset events per second, %d days from 2010-01-01" % days)
+    paths = (("scalar", scalar, "kepler"),
+             ("Range", ranged, "kepler"),
+             ("Range, 2 iter", refined, "kepler"),
+             ("riseSetIter", iterated, "kepler"),
+             ("chebyshev", ranged, "chebyshev"))
+    Suncal = suncal()
+    print("%-14s" % "" + "".join(["%14s" % name for name, f, e in paths]) +
+          "%14s" % "Suncal")
+    for name, lon, lat in LOCATIONS:
+        row = "%-14s" % name
+        for path, f, ephemeris in paths:
+            result, elapsed = cold(ephemeris, f, days, lon, lat)
+            row += "%14.0f" % (2 * days / elapsed)
+        if Suncal is None:
+            row += "%14s" % "-"
+        else:
+            result, elapsed = cold("kepler", lambda: Suncal(lat, lon,
+                datetime.date(2010, 1, 1), days).ical())
+            row += "%14.0f" % (2 * days / elapsed)
+        print(row)
+
+    lons = [lon for name, lon, lat in LOCATIONS] * 100
+    lats = [lat for name, lon, lat in LOCATIONS] * 100
+    result, elapsed = cold("kepler", Sun.sunRiseSetLocations, 2010, 1, 1,
+                           days, lons, lats)
+    print("%-14s%14.0f  (sunRiseSetLocations, %d locations)" %
+          ("all", 2 * days * len(lons) / elapsed, len(lons)))
+    if Suncal is None:
+        print("Suncal skipped: index.py can't be imported")
+
+
+def reference(filename=REFERENCE):
+    """The reference times in filename, as a list of (kind, location, lon,
+    lat, date, status, rise, set) with None for missing times."""
+    f = open(filename)
+    try:
+        rows = []
+        for row in csv.DictReader([line for line in f
+                                   if not line.startswith("#")]):
+            times = [float(row[t]) if row[t] else None
+                     for t in ("rise", "set")]
+            rows.append((row["kind"], row["location"], float(row["lon"]),
+                         float(row["lat"]),
+                         datetime.datetime.strptime(row["date"],
+                                                    "%Y-%m-%d").date(),
+                         int(row["status"])) + tuple(times))
+        return rows
+    finally:
+        f.close()
+
+
+def accuracy(filename=REFERENCE):
+    """Errors of the batch paths against the reference times."""
+    rows = reference(filename)
+    print("Errors against %d reference days in %s" %
+          (len(rows), os.path.basename(filename)))
+    print("%-15s %-14s %-13s %10s %10s %8s" %
+          ("kind", "location", "path", "mean min", "max min", "status"))
+    paths = (("Range", {}, "kepler"),
+             ("Range, 2 iter", {"iterations": 2}, "kepler"),
+             ("chebyshev", {}, "chebyshev"))
+    groups = []
+    for row in rows:
+        if not groups or groups[-1][0] != row[:2]:
+            groups.append((row[:2], []))
+        groups[-1][1].append(row)
+
+    for (kind, location), group in groups:
+        f = getattr(Sun, kind + "Range")
+        for path, kwargs, ephemeris in paths:
+            Sun.setEphemeris(ephemeris)
+            errors = []
+            wrong = 0
+            for kind, location, lon, lat, date, status, rise, set in group:
+                rises, sets, statuses = f(date.year, date.month, date.day,
+                                          1, lon, lat, **kwargs)
+                if statuses[0] != status:
+                    wrong += 1
+                elif status == Sun.RISES:
+                    errors.append(abs(rises[0] - rise) * 60.0)
+                    errors.append(abs(sets[0] - set) * 60.0)
+            Sun.setEphemeris("kepler")
+            if errors:
+                print("%-15s %-14s %-13s %10.2f %10.2f %8d" %
+                      (kind, location, path, sum(errors) / len(errors),
+                       max(errors), wrong))
+            else:
+                print("%-15s %-14s %-13s %10s %10s %8d" %
+                      (kind, location, path, "-", "-", wrong))
+
+
+def refinement(days=365):
+    """Single-pass against refined sunrise/sunset times."""
+    print("Refined sunrise/sunset, %d days from 2010-01-01" % days)
+    print("%-14s %5s %12s %12s %12s" %
+          ("location", "iter", "us/event", "mean shift", "max shift"))
+    for name, lon, lat in LOCATIONS:
+        (rises, sets, statuses), base = timed(Sun.sunRiseSetRange,
+                                              2010, 1, 1, days, lon, lat)
+        print("%-14s %5d %12.2f %12s %12s" %
+              (name, 0, 1e6 * base / (2 * days), "-", "-"))
+        for iterations in (1, 2, 3):
+            (r, s, st), elapsed = timed(Sun.sunRiseSetRange, 2010, 1, 1,
+                                        days, lon, lat, iterations=iterations)
+            shifts = [abs(a - b) * 3600.0
+                      for a, b, c in zip(rises + sets, r + s, st + st)
+                      if c == Sun.RISES]
+            print("%-14s %5d %12.2f %11.1fs %11.1fs" %
+                  (name, iterations, 1e6 * elapsed / (2 * days),
+                   sum(shifts) / max(len(shifts), 1), max(shifts + [0.0])))
+
+
+if __name__ == "__main__":
+    tests = (("speed", speed), ("accuracy", accuracy),
+             ("refinement", refinement))
+    args = sys.argv[1:]
+    if args and not args[0].isdigit():
+        test = args.pop(0)
+        tests = [(name, f) for name, f in tests if name == test]
+    for name, f in tests:
+        if f is accuracy:
+            f()
+        else:
+            f(*[int(arg) for arg in args])
+        print("")
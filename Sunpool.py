@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+Compute rise/set times and calendars for many locations on every core.
+
+Sun is pure Python, so one process only ever uses one core. precompute
+shards the locations into chunks of a few hundred, and a pool of worker
+processes runs the *Locations macros on each chunk. Each worker packs its
+times into arrays of doubles (and its statuses into bytes) and sends them
+back as raw strings, which are much cheaper to pickle than lists of
+floats; the parent just concatenates them. feeds does the same for the
+iCalendar feeds of index.Suncal.
+
+Usage: python Sunpool.py [locations] [days] [processes]
+"""
+
+import sys
+import time
+import array
+import random
+import multiprocessing
+
+from Sun import Sun
+
+__all__ = ['precompute', 'feeds']
+
+
+def _times(args):
+    """Worker: the times for one chunk of locations, as strings of packed
+    rises, sets (doubles) and statuses (signed bytes)."""
+    year, month, day, days, lons, lats, kind, iterations = args
+    rises, sets, statuses = getattr(Sun, kind + "Locations")(
+        year, month, day, days, lons, lats, iterations)
+    packed_rises = array.array('d')
+    packed_sets = array.array('d')
+    packed_statuses = array.array('b')
+    for r, s, st in zip(rises, sets, statuses):
+        packed_rises.extend(r)
+        packed_sets.extend(s)
+        packed_statuses.extend(st)
+    return (packed_rises.tostring(), packed_sets.tostring(),
+            packed_statuses.tostring())
+
+
+def _feeds(args):
+    """Worker: the iCalendar feeds for one chunk of locations."""
+    from index import Suncal
+    start, days, lons, lats, cal = args
+    return [Suncal(lat, lon, start, days, cal).ical()
+            for lon, lat in zip(lons, lats)]
+
+
+def _map(worker, units, processes):
+    """worker applied to each unit, in order, in a pool of processes (or
+    in this process if processes is 1)."""
+    if processes == 1:
+        return [worker(unit) for unit in units]
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(worker, units, 1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def precompute(year, month, day, days, lons, lats, kind="sunRiseSet",
+               iterations=0, processes=None, chunk=256):
+    """
+    The times the *Locations macro named kind (one of Sun.EVENT_TYPES)
+    gives at each location for the given number of days, starting at
+    year, month, day, computed in chunks of chunk locations by a pool of
+    processes (by default one per core). Returns arrays of rises and sets
+    ('d') and statuses ('b'), where the values for day k at location i
+    are at index i * days + k.
+    """
+    units = [(year, month, day, days, lons[i:i + chunk], lats[i:i + chunk],
+              kind, iterations) for i in range(0, len(lons), chunk)]
+    rises = array.array('d')
+    sets = array.array('d')
+    statuses = array.array('b')
+    for r, s, st in _map(_times, units, processes):
+        rises.fromstring(r)
+        sets.fromstring(s)
+        statuses.fromstring(st)
+    return rises, sets, statuses
+
+
+def feeds(start, days, lons, lats, cal="sunRiseSet", processes=None,
+          chunk=16):
+    """
+    The iCalendar feed (as index.Suncal.ical returns it) of the given
+    number of days from the date start at each location, computed in
+    chunks of chunk locations by a pool of processes (by default one per
+    core).
+    """
+    units = [(start, days, lons[i:i + chunk], lats[i:i + chunk], cal)
+             for i in range(0, len(lons), chunk)]
+    result = []
+    for chunk_feeds in _map(_feeds, units, processes):
+        result.extend(chunk_feeds)
+    return result
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    locations, days, processes = (args + [10000, 365, 0][len(args):])[:3]
+    random.seed(1)
+    lons = [random.uniform(-180.0, 180.0) for i in range(locations)]
+    lats = [random.uniform(-65.0, 65.0) for i in range(locations)]
+    for n in (1, processes or multiprocessing.cpu_count()):
+        start = time.time()
+        rises, sets, statuses = precompute(2010, 1, 1, days, lons, lats,
+                                           processes=n)
+        elapsed = time.time() - start
+        print("%3d processes: %.2fs, %.0f events per second" %
+              (n, elapsed, 2 * len(rises) / elapsed))
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+Precomputed tables of rise/set times on a latitude/longitude grid.
+
+Many locations sit within a few kilometres of each other, so rather than
+computing their times one by one, SunTable.build computes them once for
+every point of a grid (e.g. every 0.05 degrees) over a window of days and
+writes them to a file. SunTable then memory-maps that file and answers
+lookups by bilinear interpolation between the four surrounding grid
+points, without any trigonometry. build also measures the largest
+difference between the interpolated times and those of the scalar Sun
+macro (e.g. Sun.sunRiseSet) at the centre of every grid cell, and stores
+it in the file as SunTable.error. That is where interpolation is worst,
+but it is a measurement rather than a strict bound.
+
+Times which the Sun doesn't cross (polar day or night) are stored as NaN,
+and lookups in a cell with any such corner return None. The grid must
+not straddle longitude 180, where the times jump by a day.
+"""
+
+import sys
+import math
+import mmap
+import array
+import struct
+import datetime
+
+from Sun import Sun
+
+__all__ = ['SunTable']
+
+MAGIC = b"STAB"
+# magic, kind, first day (year, month, day), days, lat0, lon0, step,
+# lats, lons, error (hours)
+HEADER = "<4s24siiiidddiid"
+
+
+class SunTable:
+    """A memory-mapped table of rise/set times written by SunTable.build.
+    The table holds float32 (rise, set) pairs in hours UT, for each
+    latitude, then longitude, then day."""
+
+    def __init__(self, filename):
+        f = open(filename, "rb")
+        try:
+            self.__map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+        (magic, kind, year, month, day, self.days, self.lat0, self.lon0,
+         self.step, self.lats, self.lons, self.error) = \
+            struct.unpack_from(HEADER, self.__map)
+        if magic != MAGIC:
+            raise ValueError("%s is not a Sun table" % filename)
+        self.kind = kind.rstrip(b"\0").decode("ascii")
+        self.start = datetime.date(year, month, day)
+        self.__offset = struct.calcsize(HEADER)
+
+    def close(self):
+        self.__map.close()
+
+    @classmethod
+    def build(cls, filename, year, month, day, days, lat0, lat1, lon0, lon1,
+              step=0.05, kind="sunRiseSet"):
+        """
+        Write a table of the times which the macro named kind (one of
+        Sun.EVENT_TYPES) gives for the given number of days starting at
+        year, month, day, at every latitude from lat0 to lat1 and every
+        longitude from lon0 to lon1 in steps of step degrees. Returns the
+        SunTable.
+        """
+        ranges = getattr(Sun, kind + "Locations")
+        scalar = getattr(Sun, kind)
+        dates = [datetime.date(year, month, day) + datetime.timedelta(k)
+                 for k in range(days)]
+        lats = int(round((lat1 - lat0) / step)) + 1
+        lons = int(round((lon1 - lon0) / step)) + 1
+
+        # The times at the grid points, and the largest difference from the
+        # scalar macro at the centres of the cells between them
+        nan = float("nan")
+        data = array.array('f')
+        error = 0.0
+        below = None
+        for i in range(lats):
+            lat = lat0 + i * step
+            row = cls.__row(ranges, year, month, day, days, lon0, lons, step,
+                            lat)
+            for rises, sets, statuses in row:
+                for r, s, status in zip(rises, sets, statuses):
+                    if status == Sun.RISES:
+                        data.extend((r, s))
+                    else:
+                        data.extend((nan, nan))
+            if below is not None:
+                centres = cls.__row(ranges, year, month, day, days,
+                                    lon0 + step / 2.0, lons - 1, step,
+                                    lat - step / 2.0)
+                error = max(error, cls.__error(below, row, centres, scalar,
+                                               dates, lon0 + step / 2.0, step,
+                                               lat - step / 2.0))
+            below = row
+
+        if sys.byteorder != "little":
+            data.byteswap()
+        f = open(filename, "wb")
+        try:
+            f.write(struct.pack(HEADER, MAGIC, kind.encode("ascii"), year,
+                                month, day, days, lat0, lon0, step, lats,
+                                lons, error))
+            f.write(data.tostring())
+        finally:
+            f.close()
+        return cls(filename)
+
+    @staticmethod
+    def __row(ranges, year, month, day, days, lon0, lons, step, lat):
+        """The (rises, sets, statuses) at lons longitudes from lon0 on one
+        latitude."""
+        rises, sets, statuses = ranges(year, month, day, days,
+                                       [lon0 + j * step for j in range(lons)],
+                                       [lat] * lons)
+        return list(zip(rises, sets, statuses))
+
+    @staticmethod
+    def __error(below, above, centres, scalar, dates, lon0, step, lat):
+        """The largest difference between the times the scalar macro gives
+        at the centres of a row of cells, from lon0 on latitude lat, and
+        the average of their corners, which is what bilinear interpolation
+        gives there. Days when the Sun doesn't cross at the centre (as
+        the *Locations macro says) or at a corner are skipped."""
+        error = 0.0
+        for j, (rises, sets, statuses) in enumerate(centres):
+            corners = (below[j], below[j + 1], above[j], above[j + 1])
+            for k, date in enumerate(dates):
+                if statuses[k] != Sun.RISES or \
+                        [c for c in corners if c[2][k] != Sun.RISES]:
+                    continue
+                rise, set = scalar(date.year, date.month, date.day,
+                                   lon0 + j * step, lat)
+                r = sum([c[0][k] for c in corners]) / 4.0
+                s = sum([c[1][k] for c in corners]) / 4.0
+                error = max(error, abs(r - rise), abs(s - set))
+        return error
+
+    def __point(self, i, j):
+        """The (rise, set) times of every day at grid point i, j."""
+        start = self.__offset + (i * self.lons + j) * self.days * 8
+        values = array.array('f')
+        values.fromstring(self.__map[start:start + self.days * 8])
+        if sys.byteorder != "little":
+            values.byteswap()
+        return values
+
+    def __cell(self, lat, lon):
+        """The grid point i, j below and west of lat, lon, and how far
+        lat, lon is across the cell in each direction."""
+        x = (lat - self.lat0) / self.step
+        y = (lon - self.lon0) / self.step
+        i = min(int(math.floor(x)), self.lats - 2)
+        j = min(int(math.floor(y)), self.lons - 2)
+        if i < 0 or j < 0 or x > self.lats - 1 or y > self.lons - 1:
+            raise ValueError("%f, %f is outside the table" % (lat, lon))
+        return i, j, x - i, y - j
+
+    def lookupRange(self, lat, lon):
+        """
+        Return lists of the rise times and set times on every day of the
+        table at lat, lon, interpolated between the grid points around it.
+        Days when any of those points has no rise or set are None in
+        both. Raises ValueError if lat, lon is outside the grid.
+        """
+        i, j, fx, fy = self.__cell(lat, lon)
+
+        a = self.__point(i, j)
+        b = self.__point(i, j + 1)
+        c = self.__point(i + 1, j)
+        d = self.__point(i + 1, j + 1)
+        wa = (1.0 - fx) * (1.0 - fy)
+        wb = (1.0 - fx) * fy
+        wc = fx * (1.0 - fy)
+        wd = fx * fy
+
+        rises = []
+        sets = []
+        for k in range(0, 2 * self.days, 2):
+            r = wa * a[k] + wb * b[k] + wc * c[k] + wd * d[k]
+            s = wa * a[k + 1] + wb * b[k + 1] + wc * c[k + 1] + wd * d[k + 1]
+            if r != r or s != s:  # NaN at a corner
+                r = s = None
+            rises.append(r)
+            sets.append(s)
+        return rises, sets
+
+    def lookup(self, lat, lon, date):
+        """Return the (rise, set) times at lat, lon on the given date, or
+        None if there is no rise or set. Raises ValueError if the date or
+        location is outside the table."""
+        k = (date - self.start).days
+        if not 0 <= k < self.days:
+            raise ValueError("%s is outside the table" % date)
+        i, j, fx, fy = self.__cell(lat, lon)
+
+        # Only day k's (rise, set) pair at each corner
+        corners = [struct.unpack_from("<ff", self.__map, self.__offset +
+                                      ((i2 * self.lons + j2) * self.days +
+                                       k) * 8)
+                   for i2, j2 in ((i, j), (i, j + 1), (i + 1, j),
+                                  (i + 1, j + 1))]
+        weights = ((1.0 - fx) * (1.0 - fy), (1.0 - fx) * fy,
+                   fx * (1.0 - fy), fx * fy)
+        r = sum([w * c[0] for w, c in zip(weights, corners)])
+        s = sum([w * c[1] for w, c in zip(weights, corners)])
+        if r != r or s != s:  # NaN at a corner
+            return None
+        return r, s
@@ -10,96 +10,319 @@ different from the more-commonly used lat/long convention. We attempt to use
 lat/long where possible."""
 
 import vobject
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import calendar
+import math
 import gzip
 import cStringIO
-from mod_python import apache
+import os
+import sys
+import imp
+import time
+import threading
+import inspect
+import httplib
+import urlparse
+import hashlib
+import email.utils
+from collections import OrderedDict
+try:
+    from mod_python import apache
+    OK = apache.OK
+except ImportError:
+    # Not under mod_python; see _application below for WSGI.
+    OK = 0
+
+# Where this file, Sun.py and the Suncalendar redirects live
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Calendars are cached for CACHE_TTL seconds, up to CACHE_SIZE bytes of
+# them in each process, for locations rounded to CACHE_PRECISION decimal
+# places (about 11m).
+CACHE_SIZE = 32 * 1024 * 1024
+CACHE_TTL = 3600
+CACHE_PRECISION = 4
+
+# The most altitudes an "altitude" calendar may have; each one adds two
+# events a day
+MAX_ALTITUDES = 4
+
+# gzip compression level of the bodies, from 1 (fastest) to 9 (smallest)
+COMPRESS_LEVEL = 9
 
 
 class Suncal:
     """Wrapper class for the Sun class. One useful method which returns a
        string representation of the ICS."""
 
-    def __init__(self, lat, lon, date, days, cal="sunRiseSet"):
+    # Calendar name, the summaries of the start and end events, and the
+    # summaries of the all-day events for runs of days when the Sun stays
+    # above or below the altitude, for each type of calendar.
+    names = {
+        "sunRiseSet": ("Sunrise and Sunset times for %fN, %fW",
+                       "Sunrise", "Sunset", "Midnight sun", "Polar night"),
+        "civilTwilight": ("Civil dawn and dusk times for %fN, %fW",
+                          "Civil dawn", "Civil dusk",
+                          "No civil dusk", "No civil dawn"),
+        "nauticalTwilight": ("Nautical dawn and dusk times for %fN, %fW",
+                             "Nautical dawn", "Nautical dusk",
+                             "No nautical dusk", "No nautical dawn"),
+        "astronomicalTwilight": (
+            "Astronomical dawn and dusk times for %fN, %fW",
+            "Astronomical dawn", "Astronomical dusk",
+            "No astronomical dusk", "No astronomical dawn"),
+        "aviationTime": ("First launch and last landing times for %fN, %fW",
+                         "First launch", "Last landing",
+                         "No last landing", "No first launch"),
+        "all": ("Sunrise, sunset and twilight times for %fN, %fW",
+                None, None, None, None),
+        "altitude": ("Times the Sun crosses %s degrees for %%fN, %%fW",
+                     "Sun rises through %g degrees",
+                     "Sun sets through %g degrees",
+                     "Sun above %g degrees all day",
+                     "Sun below %g degrees all day"),
+    }
+
+    def __init__(self, lat, lon, date, days, cal="sunRiseSet",
+                 altitudes=(), deterministic=False, iterations=0):
+        """If deterministic is true, the DTSTAMPs and UIDs depend only on
+        the arguments, so the same arguments always give the same
+        calendar, byte for byte. iterations is passed to the Sun *Range
+        macros to refine the times (2 is plenty)."""
         from Sun import Sun
-        f = getattr(Sun, cal, Sun.sunRiseSet)
         self.utc = vobject.icalendar.utc
         self.v = vobject.iCalendar()
         self.lat = lat
         self.lon = lon
         self.d = date
-        if cal == "sunRiseSet":
-            name = "Sunrise and Sunset times for %fN, %fW"
-            start = "Sunrise"
-            end = "Sunset"
-        elif cal == "civilTwilight":
-            name = "Civil dawn and dusk times for %fN, %fW"
-            start = "Civil dawn"
-            end = "Civil dusk"
-        elif cal == "nauticalTwilight":
-            name = "Nautical dawn and dusk times for %fN, %fW"
-            start = "Nautical dawn"
-            end = "Nautical dusk"
-        elif cal == "astronomicalTwilight":
-            name = "Astronomical dawn and dusk times for %fN, %fW"
-            start = "Astronomical dawn"
-            end = "Astronomical dusk"
-        elif cal == "aviationTime":
-            name = "First launch and last landing times for %fN, %fW"
-            start = "First launch"
-            end = "Last landing"
-        else:
-            name = "Times for %fN, %fW" # but it will error anyway.
-            start = "Start"
-            end = "End"
+        self.deterministic = deterministic
+        if deterministic:
+            # Midnight UT at the start of the calendar
+            self.stamp = datetime(date.year, date.month, date.day,
+                                  tzinfo=self.utc)
+        if cal not in self.names:
+            cal = "sunRiseSet"
+        name, start, end, up, down = self.names[cal]
+        if cal == "altitude":
+            name = name % ", ".join(["%g" % a for a in altitudes])
         self.v.add('x-wr-calname').value = name % (lat, lon)
         self.v.add('prodid').value = \
             "-//Bruce Duncan//Sunriseset Calendar 1.2//EN"
         self.v.add('description').value = "Show the sunrise and sunset times" \
             + " for a given location for one year from the current date."
-        for date in range(days):
-            riseTime, setTime = f(self.d.year, self.d.month, self.d.day,
-                          lon, lat) # lat/long reversed.
-            self.__addPoint(riseTime, start)
-            self.__addPoint(setTime, end)
-            self.d += timedelta(1)
-
-    def __addPoint(self, time, summary):
+        if cal == "all":
+            # Every type of time, from one pass over the Sun's position.
+            times = Sun.allTimesRange(self.d.year, self.d.month, self.d.day,
+                    days, lon, lat, iterations) # lat/long reversed.
+            kinds = [times[kind] + self.names[kind][1:]
+                     for kind, altit, upper_limb, offset in Sun.EVENT_TYPES]
+        elif cal == "altitude":
+            # The Sun's center crossing each of the given altitudes.
+            times = Sun.altitudeCrossingsRange(self.d.year, self.d.month,
+                self.d.day, days, lon, lat, altitudes,
+                iterations=iterations) # lat/long reversed.
+            kinds = [t + (start % a, end % a, up % a, down % a)
+                     for t, a in zip(times, altitudes)]
+        else:
+            f = getattr(Sun, cal + "Range")
+            rises, sets, statuses = f(self.d.year, self.d.month, self.d.day,
+                    days, lon, lat, iterations) # lat/long reversed.
+            kinds = [(rises, sets, statuses, start, end, up, down)]
+        for rises, sets, statuses, start, end, up, down in kinds:
+            # Runs of days when the Sun doesn't cross the altitude become a
+            # single all-day event rather than a bogus rise and set each day.
+            first = 0
+            for i in range(days + 1):
+                if i < days and statuses[i] == statuses[first]:
+                    continue
+                if statuses[first] == Sun.RISES:
+                    for j in range(first, i):
+                        self.__addPoint(j, rises[j], start)
+                        self.__addPoint(j, sets[j], end)
+                elif statuses[first] == Sun.ALWAYS_UP:
+                    self.__addDays(first, i, up)
+                else:
+                    self.__addDays(first, i, down)
+                first = i
+
+    def __addPoint(self, day, time, summary):
+        """Add an event at time hours UT on the day'th day."""
         ev = self.v.add('vevent')
         ev.add('summary').value = summary
-        ev.add('uid').value = str(calendar.timegm(start.value.timetuple())) \
-                + "-1@suncalendar"
         ev.add('geo').value = "%f;%f" % (self.lat, self.lon)
-        ev.add('dtstamp').value = datetime.utcnow()
+        ev.add('dtstamp').value = self.__stamp()
         start = ev.add('dtstart')
         end = ev.add('dtend')
-        minute = 60 * (time - int(time))
-        second = 60 * (minute - int(minute))
         start.value = end.value = datetime(self.d.year, self.d.month,
-                self.d.day, int(time), int(minute), int(second),
-                tzinfo=self.utc)
+                self.d.day, tzinfo=self.utc) + \
+                timedelta(days=day, seconds=int(math.floor(time * 3600)))
+        if self.deterministic:
+            ev.add('uid').value = self.__uid(day, summary)
+        else:
+            ev.add('uid').value = \
+                str(calendar.timegm(start.value.timetuple())) + \
+                "-1@suncalendar"
+
+    def __addDays(self, first, last, summary):
+        """Add an all-day event from the first'th day up to (but not
+        including) the last'th day."""
+        ev = self.v.add('vevent')
+        ev.add('summary').value = summary
+        ev.add('geo').value = "%f;%f" % (self.lat, self.lon)
+        ev.add('dtstamp').value = self.__stamp()
+        start = ev.add('dtstart')
+        end = ev.add('dtend')
+        start.value = date(self.d.year, self.d.month, self.d.day) + \
+                timedelta(first)
+        end.value = start.value + timedelta(last - first)
+        if self.deterministic:
+            ev.add('uid').value = self.__uid(first, summary)
+        else:
+            ev.add('uid').value = "%s-%s@suncalendar" % (
+                start.value.strftime("%Y%m%d"),
+                summary.lower().replace(" ", "-"))
+
+    def __stamp(self):
+        """The DTSTAMP of the events."""
+        if self.deterministic:
+            return self.stamp
+        return datetime.utcnow()
+
+    def __uid(self, day, summary):
+        """A UID made of the day'th day's date, the kind of event and the
+        location, which are unique to each event."""
+        return "%s-%s-%f-%f@suncalendar" % (
+            (date(self.d.year, self.d.month, self.d.day) +
+             timedelta(day)).strftime("%Y%m%d"),
+            summary.lower().replace(" ", "-"), self.lat, self.lon)
 
     def ical(self):
         return self.v.serialize().replace("\r\n", "\n").strip()
 
-def compressBuf(buf):
+class LRUCache:
+    """A thread-safe cache of values totalling at most size bytes, as
+    measured by sizeof, which evicts the least recently used values when
+    full and forgets values ttl seconds after they were put."""
+
+    def __init__(self, size, ttl, sizeof=len):
+        self.size = size
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.values = OrderedDict()
+
+    def get(self, key):
+        """Return the value for key, or None if there isn't one."""
+        self.lock.acquire()
+        try:
+            if key not in self.values:
+                return None
+            expires, value = self.values.pop(key)
+            if expires < time.time():
+                self.bytes -= self.sizeof(value)
+                return None
+            self.values[key] = (expires, value)
+            return value
+        finally:
+            self.lock.release()
+
+    def put(self, key, value):
+        """Cache value for key, unless it is bigger than the whole cache."""
+        size = self.sizeof(value)
+        if size > self.size:
+            return
+        self.lock.acquire()
+        try:
+            if key in self.values:
+                self.bytes -= self.sizeof(self.values.pop(key)[1])
+            self.values[key] = (time.time() + self.ttl, value)
+            self.bytes += size
+            while self.bytes > self.size:
+                expires, old = self.values.popitem(last=False)[1]
+                self.bytes -= self.sizeof(old)
+        finally:
+            self.lock.release()
+
+# The compressed bodies of calendars
+_calendars = LRUCache(CACHE_SIZE, CACHE_TTL)
+
+# mod_python.publisher serves every public function here as a URL, with
+# the query arguments as its arguments, so helpers must start with _.
+
+def _compressBuf(buf):
     zbuf = cStringIO.StringIO()
-    zfile = gzip.GzipFile(mode='wb', fileobj=zbuf)
+    zfile = gzip.GzipFile(mode='wb', fileobj=zbuf,
+                          compresslevel=COMPRESS_LEVEL, mtime=0)
     zfile.write(buf)
     zfile.close()
     return zbuf.getvalue()
 
-def testAcceptsGzip(req):
+def _decompressBuf(zbuf):
+    zfile = gzip.GzipFile(mode='rb', fileobj=cStringIO.StringIO(zbuf))
+    try:
+        return zfile.read()
+    finally:
+        zfile.close()
+
+def _testAcceptsGzip(req):
     if req.headers_in.has_key('accept-encoding'):
         return (req.headers_in['accept-encoding'].find("gzip") != -1)
     else:
         return False
 
-def index(req):
-    """Serve the static index page."""
-    req.content_type = "application/xhtml+xml"
-    s = """\
+def _bodies(s):
+    """The body s and its gzip-compressed version, to be sent by
+    _writeBody."""
+    return s, _compressBuf(s)
+
+def _readBodies(filename):
+    """The _bodies of the contents of filename."""
+    f = open(filename)
+    try:
+        return _bodies(f.read())
+    finally:
+        f.close()
+
+def _badRequest(req, message):
+    """Answer 400 Bad Request, with message as the reason."""
+    req.status = 400
+    req.content_type = 'text/plain'
+    req.send_http_header()
+    req.write(message)
+    return OK
+
+def _notModified(req, etag, modified):
+    """Whether the client's copy, according to its If-None-Match or (only
+    if it didn't send that) If-Modified-Since header, is the current one,
+    given the ETag and Last-Modified time (seconds since the epoch)."""
+    if req.headers_in.has_key('if-none-match'):
+        tags = [tag.strip() for tag in
+                req.headers_in['if-none-match'].split(",")]
+        return "*" in tags or etag in tags or \
+            etag.replace('W/', '') in [tag.replace('W/', '') for tag in tags]
+    if req.headers_in.has_key('if-modified-since'):
+        since = email.utils.parsedate_tz(req.headers_in['if-modified-since'])
+        return since is not None and email.utils.mktime_tz(since) >= modified
+    return False
+
+def _writeBody(req, body):
+    """Send whichever of the (plain, compressed) pair body the client
+    accepts. If plain is None, it is decompressed when needed."""
+    s, zbuf = body
+    if _testAcceptsGzip(req):
+        req.headers_out['Content-Encoding'] = 'gzip'
+        req.headers_out['Content-Length'] = str(len(zbuf))
+        req.send_http_header()
+        req.write(zbuf)
+    else:
+        if s is None:
+            s = _decompressBuf(zbuf)
+        req.headers_out['Content-Length'] = str(len(s))
+        req.send_http_header()
+        req.write(s)
+
+INDEX_PAGE = _bodies("""\
 <?xml version="1.0" encoding="iso-8859-1"?>
 <!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Strict//EN"
   "http://www.w3.org/TR/xhtml1/DTD/xhtml1-strict.dtd">
@@ -114,7 +337,9 @@ function showLink() {
     document.getElementById('link').href = 'cal?lat=' +
         document.getElementById('lat').value + '&lon=' +
         document.getElementById('lon').value + '&cal=' +
-        document.getElementById('cal').value;
+        document.getElementById('cal').value + '&alt=' +
+        encodeURIComponent(document.getElementById('alt').value) +
+        (document.getElementById('refine').checked ? '&refine=1' : '');
     document.getElementById('link').innerHTML = 'iCalendar for &quot;' +
         document.getElementById('cal').options[
             document.getElementById('cal').selectedIndex].innerHTML +
@@ -161,7 +386,15 @@ Edinburgh.</p>
 <option value="civilTwilight">Civil dawn/dusk</option>
 <option value="nauticalTwilight">Nautical dawn/dusk</option>
 <option value="astronomicalTwilight">Astronomical dawn/dusk</option>
+<option value="all">All of the above</option>
+<option value="altitude">Sun crossing these altitudes</option>
 </select><br />
+<label for="alt">Altitudes (degrees, comma-separated, for the last type;
+e.g. 6 for golden hour, -4 for blue hour)</label>
+<input type="text" name="alt" id="alt" value="6" /><br />
+<input type="checkbox" name="refine" id="refine" value="1" />
+<label for="refine">Refine the times for the Sun's motion during the day
+(a few seconds to a minute or so, more near the poles)</label><br />
 <input type="submit" value="Download .ics" />
 <input type="submit" name="URL" value="Show Link"
     onclick="return showLink()" />
@@ -185,6 +418,11 @@ Engineering<span style="text-decoration: line-through"> and
 Electronics</span></a>, but I wrote it in my own time.
 I used <a href="http://www.vim.org/">Vim</a>.</p>
 <h2>Changes</h2>
+<p><b>2026-10-18</b></p>
+<p>Add a calendar with all of the sunrise, sunset and twilight times, and one
+for the Sun crossing any altitudes you like (golden hour, blue hour and so on).
+Runs of days with midnight sun or polar night are now shown as one all-day
+event.</p>
 <p><b>2010-06-23</b></p>
 <p>Tidy up the python following pep8 and pylint recommendations (mostly
 renaming variables which clash with keywords or builtins like &quot;type&quot;
@@ -207,92 +445,124 @@ from one month ago.</p>
 </p>
 </body>
 </html>
-"""
-    if testAcceptsGzip(req):
-        zbuf = compressBuf(s)
-        req.headers_out['Content-Encoding'] = 'gzip'
-        req.headers_out['Content-Length'] = str(len(zbuf))
-        req.send_http_header()
-        req.write(zbuf)
-    else:
-        req.headers_out['Content-Length'] = str(len(s))
-        req.send_http_header()
-        req.write(s)
-    return apache.OK
+""")
 
 
-def cal(req, lat=None, lon=None, cal=None):
+def index(req):
+    """Serve the static index page."""
+    req.content_type = "application/xhtml+xml"
+    _writeBody(req, INDEX_PAGE)
+    return OK
+
+
+def cal(req, lat=None, lon=None, cal=None, alt=None, refine=None):
     """Use the Suncal class to output a calendar for one year from the current
-    date."""
+    date. For the "altitude" calendar, alt is a comma-separated list of the
+    altitudes in degrees. If refine is "1", the times allow for the Sun's
+    motion during the day."""
     if lat is None or lon is None:
         req.status = 302
         req.content_type = 'text/plain'
         req.headers_out['Location'] = '.'
         req.write('Found')
-    if cal is None:
+        return OK
+    if cal not in Suncal.names:
+        # Including None; unknown types share the default calendar
         cal = "sunRiseSet"
+    try:
+        lat = float(lat)
+        lon = float(lon)
+    except ValueError:
+        return _badRequest(req, "lat and lon must be numbers")
+    # NaN fails both comparisons
+    if not -90.0 <= lat <= 90.0:
+        return _badRequest(req, "lat must be from -90 to 90")
+    if not -360.0 <= lon <= 360.0:
+        return _badRequest(req, "lon must be from -360 to 360")
+    altitudes = [6.0]
+    if cal == "altitude" and alt:
+        try:
+            altitudes = [float(a) for a in alt.split(",") if a.strip()]
+        except ValueError:
+            return _badRequest(req, "alt must be numbers, separated by commas")
+        # Altitudes which print the same would give their events the same
+        # summaries, and so the same UIDs
+        unique = []
+        for a in altitudes:
+            if "%g" % a not in ["%g" % b for b in unique]:
+                unique.append(a)
+        altitudes = unique
+        if not altitudes:
+            altitudes = [6.0]
+        if len(altitudes) > MAX_ALTITUDES:
+            return _badRequest(req, "At most %d altitudes" % MAX_ALTITUDES)
+        if [a for a in altitudes if not -90.0 <= a <= 90.0]:
+            return _badRequest(req, "Altitudes must be from -90 to 90")
     req.content_type = "text/calendar"
     d = datetime.today()
+    # Nearby locations share a calendar
+    lat = round(lat, CACHE_PRECISION)
+    lon = round(lon, CACHE_PRECISION)
     req.headers_out['Content-Disposition'] = \
         'attachment; filename="%s_%s-%s-%s_%02f_%02f.ics"' % (
-        cal, d.year, d.month, d.day, float(lat), float(lon))
-    k = Suncal(float(lat), float(lon), d - timedelta(days=30), 365, cal)
-    s = k.ical()
-    if testAcceptsGzip(req):
-        zbuf = compressBuf(s)
-        req.headers_out['Content-Encoding'] = 'gzip'
-        req.headers_out['Content-Length'] = str(len(zbuf))
-        req.send_http_header()
-        req.write(zbuf)
-    else:
-        req.headers_out['Content-Length'] = str(len(s))
+        cal, d.year, d.month, d.day, lat, lon)
+    start = (d - timedelta(days=30)).date()
+    iterations = refine == "1" and 2 or 0
+    key = (lat, lon, cal, start,
+           cal == "altitude" and tuple(altitudes) or (), iterations)
+
+    # The calendar only depends on the key and the code, byte for byte, so
+    # clients which already have it needn't get it again. It changes once
+    # a day, when the start date moves on at local midnight, and when the
+    # code changes, which takes a reload. The ETag is weak as it covers
+    # both the plain and gzip bodies.
+    etag = 'W/"%s"' % hashlib.md5(repr(key) + CODE_VERSION).hexdigest()
+    modified = max(int(time.mktime(d.date().timetuple())), LOADED)
+    req.headers_out['ETag'] = etag
+    req.headers_out['Last-Modified'] = email.utils.formatdate(modified,
+                                                              usegmt=True)
+    req.headers_out['Vary'] = 'Accept-Encoding'
+    if _notModified(req, etag, modified):
+        req.status = 304
         req.send_http_header()
-        req.write(s)
-    return apache.OK
+        return OK
+
+    # Only the compressed body is kept; few clients want the other
+    zbuf = _calendars.get(key)
+    if zbuf is None:
+        k = Suncal(lat, lon, start, 365, cal, altitudes, deterministic=True,
+                   iterations=iterations)
+        zbuf = _compressBuf(k.ical())
+        _calendars.put(key, zbuf)
+    _writeBody(req, (None, zbuf))
+    return OK
+
+
+SUN_SOURCE = _readBodies(os.path.join(HERE, "Sun.py"))
 
 
 def Sunsource(req):
     """Distribute the Sun module."""
     req.content_type = "application/x-python"
     req.headers_out['Content-Disposition'] = 'attachment; filename="Sun.py"'
-    f = open("/home/bduncan/WWW/Suncalendar/Sun.py")
-    try:
-        s = f.read()
-    finally:
-        f.close()
-    if testAcceptsGzip(req):
-        zbuf = compressBuf(s)
-        req.headers_out['Content-Encoding'] = 'gzip'
-        req.headers_out['Content-Length'] = str(len(zbuf))
-        req.send_http_header()
-        req.write(zbuf)
-    else:
-        req.headers_out['Content-Length'] = str(len(s))
-        req.send_http_header()
-        req.write(s)
-    return apache.OK
+    _writeBody(req, SUN_SOURCE)
+    return OK
+
+
+SOURCE = _readBodies(os.path.join(HERE, "index.py"))
+
+# Changes whenever the code which generates calendars does
+CODE_VERSION = hashlib.md5(SUN_SOURCE[0] + SOURCE[0]).hexdigest()
+# When this code was loaded, so the earliest a calendar can have changed
+LOADED = int(time.time())
 
 
 def source(req):
     """Deliver the source. Self-replicating code!"""
     req.content_type = "application/x-python"
     req.headers_out['Content-Disposition'] = 'attachment; filename="Suncalendar.py"'
-    f = open("/home/bduncan/WWW/Suncalendar/index.py")
-    try:
-        s = f.read()
-    finally:
-        f.close()
-    if testAcceptsGzip(req):
-        zbuf = compressBuf(s)
-        req.headers_out['Content-Encoding'] = 'gzip'
-        req.headers_out['Content-Length'] = str(len(zbuf))
-        req.send_http_header()
-        req.write(zbuf)
-    else:
-        req.headers_out['Content-Length'] = str(len(s))
-        req.send_http_header()
-        req.write(s)
-    return apache.OK
+    _writeBody(req, SOURCE)
+    return OK
 
 
 def Suncalendar(req):
@@ -303,7 +573,82 @@ def Suncalendar(req):
     req.write("Moved permanently")
 
 
+class WSGIRequest:
+    """Just enough of mod_python's request object for the handlers above,
+    built from a WSGI environ."""
+
+    def __init__(self, environ):
+        self.headers_in = {}
+        for key, value in environ.items():
+            if key.startswith("HTTP_"):
+                self.headers_in[key[5:].replace("_", "-").lower()] = value
+        self.headers_out = {}
+        self.content_type = "text/plain"
+        self.status = 200
+        self.args = environ.get("QUERY_STRING", "")
+        self.body = []
+
+    def send_http_header(self):
+        pass
+
+    def write(self, s):
+        self.body.append(s)
+
+
+# The handlers mod_python.publisher finds in this file, by URL
+_HANDLERS = {"": index, "index": index, "cal": cal, "Sunsource": Sunsource,
+             "source": source, "Suncalendar": Suncalendar}
+
+# And those in Suncalendar/index.py, which redirect old URLs here
+_old = imp.load_source("Suncalendar_index",
+                       os.path.join(HERE, "Suncalendar", "index.py"))
+_OLD_HANDLERS = {"": _old.index, "index": _old.index, "cal": _old.cal,
+                 "Suncalendar": _old.Suncalendar}
+
+
+def _application(environ, start_response):
+    """Serve the same URLs as mod_python.publisher does from .htaccess, as
+    a WSGI application. Query (and form) arguments are passed to the
+    handler's keyword arguments of the same names, as the publisher does.
+    It starts with _ so that the publisher doesn't serve it too; point the
+    WSGI server at it by name (e.g. index:_application)."""
+    path = environ.get("PATH_INFO", "").lstrip("/").split("/")
+    handlers = _HANDLERS
+    if len(path) > 1 and path[0] == "Suncalendar":
+        handlers = _OLD_HANDLERS
+        path = path[1:]
+    if path[0] == "index.py":
+        path = path[1:] or [""]
+    if len(path) != 1 or path[0] not in handlers:
+        start_response("404 Not Found", [("Content-Type", "text/plain")])
+        return ["Not Found"]
+    handler = handlers[path[0]]
+
+    req = WSGIRequest(environ)
+    fields = urlparse.parse_qs(req.args)
+    if environ.get("REQUEST_METHOD") == "POST":
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+        fields.update(urlparse.parse_qs(environ["wsgi.input"].read(length)))
+    names = inspect.getargspec(handler)[0][1:]
+    kwargs = dict([(name, fields[name][0]) for name in names
+                   if name in fields])
+    handler(req, **kwargs)
+
+    headers = [("Content-Type", req.content_type)] + \
+        list(req.headers_out.items())
+    start_response("%d %s" % (req.status,
+                              httplib.responses.get(req.status, "")),
+                   headers)
+    return req.body
+
+
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["serve"]:
+        # python index.py serve [port]: serve locally, without Apache
+        from wsgiref.simple_server import make_server
+        port = int((sys.argv[2:] or [8000])[0])
+        print "Serving on http://localhost:%d/" % port
+        make_server("", port, _application).serve_forever()
     k = Suncal(55.932756, -3.177664,
         datetime.today() - timedelta(days=30), 365)
     print k.ical()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+Generate Sunephem.dat, the compressed solar ephemeris which Sun uses after
+Sun.setEphemeris("chebyshev").
+
+The Sun's declination, equation of time and distance, as computed by the
+original Sun formulae, are fitted with Chebyshev polynomials over
+consecutive segments of SEGMENT_DAYS days covering 1801-2099. The RA is
+recovered from the equation of time by adding the Sun's mean longitude.
+Every segment is then checked against the original formulae at points
+between the fitting nodes, and the worst errors are reported.
+
+The file starts with a little-endian header (magic, first day, segment
+length, number of segments and number of coefficients for each quantity)
+followed by the coefficients of every segment as 32-bit floats.
+
+Usage: python mkSunephem.py [output file]
+"""
+
+import sys
+import math
+import array
+import struct
+
+from Sun import Sun
+
+MAGIC = b"SEPH"
+HEADER = "<4sddiiii"
+
+# About six weeks per segment
+SEGMENT_DAYS = 46.0
+
+# Number of coefficients for declination, equation of time and distance
+DEGREES = (6, 6, 4)
+
+
+def position(d):
+    """The Sun's declination, equation of time (degrees) and distance at d,
+    from the original formulae."""
+    sRA, sdec, sr = Sun._Sun__sunRADec(d)
+    L = 356.0470 + 282.9404 + (0.9856002585 + 4.70935E-5) * d
+    eot = sRA - L
+    eot -= 360.0 * math.floor(eot / 360.0 + 0.5)
+    return sdec, eot, sr
+
+
+def fit(first, length):
+    """Return the Chebyshev coefficients of each quantity for the segment
+    starting at first."""
+    coefficients = []
+    for q, n in enumerate(DEGREES):
+        nodes = [math.pi * (j + 0.5) / n for j in range(n)]
+        values = [position(first + length * (math.cos(x) + 1.0) / 2.0)[q]
+                  for x in nodes]
+        c = [2.0 / n * sum(v * math.cos(k * x) for v, x in zip(values, nodes))
+             for k in range(n)]
+        c[0] /= 2.0
+        coefficients.append(c)
+    return coefficients
+
+
+def chebyshev(c, t):
+    """Evaluate the Chebyshev series c at t (-1 <= t <= 1)."""
+    b1 = b2 = 0.0
+    for ck in c[:0:-1]:
+        b1, b2 = 2.0 * t * b1 - b2 + ck, b1
+    return t * b1 - b2 + c[0]
+
+
+def main(filename="Sunephem.dat"):
+    first = Sun._Sun__daysSince2000Jan0(1801, 1, 1) - 2.0
+    last = Sun._Sun__daysSince2000Jan0(2099, 12, 31) + 2.0
+    segments = int(math.ceil((last - first) / SEGMENT_DAYS))
+
+    Sun.setEphemeris("kepler")
+    data = array.array('f')
+    worst = [0.0, 0.0, 0.0]
+    for k in range(segments):
+        start = first + k * SEGMENT_DAYS
+        coefficients = fit(start, SEGMENT_DAYS)
+        for c in coefficients:
+            data.extend(c)
+
+        # Check against the original formulae, using the coefficients as
+        # they will be stored
+        stored = [array.array('f', c).tolist() for c in coefficients]
+        for i in range(97):
+            t = -1.0 + 2.0 * (i + 0.5) / 97
+            exact = position(start + SEGMENT_DAYS * (t + 1.0) / 2.0)
+            for q in range(3):
+                worst[q] = max(worst[q],
+                               abs(chebyshev(stored[q], t) - exact[q]))
+
+    if sys.byteorder != "little":
+        data.byteswap()
+    f = open(filename, "wb")
+    try:
+        f.write(struct.pack(HEADER, MAGIC, first, SEGMENT_DAYS, segments,
+                            *DEGREES))
+        f.write(data.tostring())
+    finally:
+        f.close()
+
+    print("Wrote %d segments of %g days to %s" % (segments, SEGMENT_DAYS,
+                                                   filename))
+    print("Largest errors: declination %.2g deg, RA %.2g deg "
+          "(%.2g s of time), distance %.2g AU" %
+          (worst[0], worst[1], worst[1] * 240.0, worst[2]))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+Generate Sunref.csv, the reference rise/set times which Sunbench.py checks
+the Sun module against.
+
+The times are computed independently of Sun.py, from the higher accuracy
+solar coordinates of Meeus, "Astronomical Algorithms" (2nd ed.), chapter
+25: the apparent longitude (with nutation and aberration) and the true
+obliquity give the Sun's RA and declination to about 0.01 degrees, and
+the mean sidereal time is that of chapter 12. Rather than assuming the
+Sun stays still all day, each time is found by bisection on the Sun's
+altitude, recomputing its position at every step, to 0.01 s. Like Sun.py
+this ignores the difference between UT and TT (about a minute these
+days, which moves the Sun by less than 0.001 degrees) and the nutation in
+RA (about a second).
+
+The events are those Sun.py computes: sunrise/sunset, when the Sun's upper
+limb is 35 arc minutes below the horizon (the center 35' plus the
+apparent radius below it), and civil twilight, when the center is 6
+degrees below. Each day's rise and set are those either side of the
+day's transit over the meridian nearest to 12h local mean time, with
+times in hours UT from the start of the day, as Sun.py gives them.
+
+Each line of the file holds kind, location, lon, lat, date, status (as
+Sun.RISES, ALWAYS_UP and ALWAYS_DOWN), rise and set; the times are empty
+when the Sun doesn't cross the altitude.
+
+Usage: python mkSunref.py [output file]
+"""
+
+import sys
+import math
+import datetime
+
+# (name, lon, lat), from the equator to both polar regions
+LOCATIONS = (("Edinburgh", -3.177664, 55.932756),
+             ("Equator", 0.0, 0.0),
+             ("Tromsø", 18.95, 69.65),
+             ("Hobart", 147.33, -42.88),
+             ("Longyearbyen", 15.65, 78.22),
+             ("McMurdo", 166.67, -77.85))
+
+# (kind, altitude of the center, whether to lower it by the Sun's radius)
+KINDS = (("sunRiseSet", -35.0 / 60.0, True),
+         ("civilTwilight", -6.0, False))
+
+# Every STEP days from FIRST for DAYS days
+FIRST = datetime.date(2000, 1, 1)
+DAYS = 30 * 365
+STEP = 23
+
+RISES, ALWAYS_UP, ALWAYS_DOWN = 0, 1, -1
+
+
+def position(jd):
+    """The Sun's apparent RA, declination (degrees), distance (AU) and the
+    mean sidereal time at Greenwich (degrees) at the julian day jd."""
+    T = (jd - 2451545.0) / 36525.0
+    L0 = 280.46646 + 36000.76983 * T + 0.0003032 * T * T
+    M = math.radians(357.52911 + 35999.05029 * T - 0.0001537 * T * T)
+    e = 0.016708634 - 0.000042037 * T - 0.0000001267 * T * T
+    C = ((1.914602 - 0.004817 * T - 0.000014 * T * T) * math.sin(M) +
+         (0.019993 - 0.000101 * T) * math.sin(2.0 * M) +
+         0.000289 * math.sin(3.0 * M))
+    v = M + math.radians(C)
+    R = 1.000001018 * (1.0 - e * e) / (1.0 + e * math.cos(v))
+
+    omega = math.radians(125.04 - 1934.136 * T)
+    lam = math.radians(L0 + C - 0.00569 - 0.00478 * math.sin(omega))
+    eps = math.radians(23.0 + 26.0 / 60.0 +
+                       (21.448 - 46.8150 * T - 0.00059 * T * T +
+                        0.001813 * T * T * T) / 3600.0 +
+                       0.00256 * math.cos(omega))
+    ra = math.degrees(math.atan2(math.cos(eps) * math.sin(lam),
+                                 math.cos(lam)))
+    dec = math.degrees(math.asin(math.sin(eps) * math.sin(lam)))
+
+    gmst = (280.46061837 + 360.98564736629 * (jd - 2451545.0) +
+            0.000387933 * T * T - T * T * T / 38710000.0)
+    return ra, dec, R, gmst
+
+
+def altitude(jd, lon, lat):
+    """The altitude of the Sun's center (degrees) and its distance."""
+    ra, dec, R, gmst = position(jd)
+    H = math.radians(gmst + lon - ra)
+    lat = math.radians(lat)
+    dec = math.radians(dec)
+    return math.degrees(math.asin(math.sin(lat) * math.sin(dec) +
+                                  math.cos(lat) * math.cos(dec) *
+                                  math.cos(H))), R
+
+
+def transit(jd, lon):
+    """The time of the Sun's transit over the meridian nearest jd."""
+    for it in range(5):
+        ra, dec, R, gmst = position(jd)
+        H = gmst + lon - ra
+        H -= 360.0 * math.floor(H / 360.0 + 0.5)
+        jd -= H / 360.98564736629
+    return jd
+
+
+def crossing(lo, hi, lon, lat, altit, limb):
+    """Bisect for the time between lo and hi when the Sun crosses altit,
+    given that it is below altit at lo (and above at hi) or the other way
+    round."""
+    def above(jd):
+        a, R = altitude(jd, lon, lat)
+        if limb:
+            a += 0.26656 / R
+        return a > altit
+    rising = above(hi)
+    while hi - lo > 0.01 / 86400.0:
+        mid = (lo + hi) / 2.0
+        if above(mid) == rising:
+            hi = mid
+        else:
+            lo = mid
+    return (lo + hi) / 2.0
+
+
+def events(date, lon, lat, altit, limb):
+    """The status, rise and set (hours UT from the start of date)."""
+    jd0 = 2451544.5 + (date - datetime.date(2000, 1, 1)).days
+    noon = transit(jd0 + 0.5 - lon / 360.0, lon)
+    a, R = altitude(noon, lon, lat)
+    if limb:
+        a += 0.26656 / R
+    if a <= altit:
+        return ALWAYS_DOWN, None, None
+    before = transit(noon - 0.5, lon + 180.0)
+    after = transit(noon + 0.5, lon + 180.0)
+    lows = [altitude(jd, lon, lat) for jd in (before, after)]
+    if limb:
+        lows = [a + 0.26656 / R for a, R in lows]
+    else:
+        lows = [a for a, R in lows]
+    if lows[0] > altit or lows[1] > altit:
+        return ALWAYS_UP, None, None
+    rise = crossing(before, noon, lon, lat, altit, limb)
+    set = crossing(noon, after, lon, lat, altit, limb)
+    return RISES, (rise - jd0) * 24.0, (set - jd0) * 24.0
+
+
+def main(filename="Sunref.csv"):
+    f = open(filename, "w")
+    try:
+        f.write("# Reference times written by mkSunref.py; see there for "
+                "how they are computed\n")
+        f.write("kind,location,lon,lat,date,status,rise,set\n")
+        lines = 0
+        for kind, altit, limb in KINDS:
+            for name, lon, lat in LOCATIONS:
+                for k in range(0, DAYS, STEP):
+                    date = FIRST + datetime.timedelta(k)
+                    status, rise, set = events(date, lon, lat, altit, limb)
+                    f.write("%s,%s,%r,%r,%s,%d,%s,%s\n" % (
+                        kind, name, lon, lat, date.isoformat(), status,
+                        "%.6f" % rise if rise is not None else "",
+                        "%.6f" % set if set is not None else ""))
+                    lines += 1
+    finally:
+        f.close()
+    print("Wrote %d reference times to %s" % (lines, filename))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])